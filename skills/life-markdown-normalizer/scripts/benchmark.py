@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+笔记标准化性能基准
+- frontmatter: 比较扁平快速路径、libyaml (CSafeLoader) 与 yaml.safe_load 的单篇解析耗时
+- generate: 生成合成笔记库（数量、大小、frontmatter 比例、正文中 YAML、中英文混排可配置）
+- vault: 在合成笔记库上测量 dry-run / execute 的吞吐量（文件/秒）和峰值内存，
+  以及 extract_yaml_frontmatter、generate_tags_from_content 的单篇耗时
+"""
+
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import yaml
+
+from normalize_notes import (
+    CSafeLoader,
+    KEYWORD_MAP,
+    extract_yaml_frontmatter,
+    generate_tags_from_content,
+    load_frontmatter_yaml,
+    parse_flat_frontmatter,
+)
+
+SCRIPT_PATH = Path(__file__).resolve().parent / 'normalize_notes.py'
+
+# 典型 frontmatter 样本：标准化后的笔记、旧格式笔记、无法走快速路径的复杂写法
+FRONTMATTER_SAMPLES = {
+    '标准格式': (
+        "title: 从Claude Code设计机制看上下文工程\n"
+        "date_created: 20251202112156\n"
+        "date_modified: 20251202113149\n"
+        "tags: ['AI', '认知科学', '技术']\n"
+    ),
+    '旧格式': (
+        "title: Meeting Notes from Project Alpha\n"
+        "date created: 202501181430\n"
+        "tags: [会议, 项目, 管理]\n"
+    ),
+    '复杂写法': (
+        "title: \"Quoted: with colon\"\n"
+        "date_created: 2025-01-18\n"
+        "tags:\n"
+        "  - AI\n"
+        "  - 技术\n"
+        "aliases: [a, b]  # comment\n"
+    ),
+}
+
+def time_per_call(func, text, iterations):
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(text)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def bench_frontmatter(iterations):
+    """逐个样本比较各解析路径的单篇耗时"""
+    parsers = [
+        ('快速路径', parse_flat_frontmatter),
+        ('CSafeLoader', (lambda text: yaml.load(text, Loader=CSafeLoader)) if CSafeLoader else None),
+        ('safe_load', yaml.safe_load),
+        ('自动选择', load_frontmatter_yaml),
+    ]
+
+    print(f"frontmatter 解析耗时（微秒/篇，{iterations} 次平均）")
+    print(f"libyaml: {'可用' if CSafeLoader else '不可用'}")
+    print("=" * 60)
+    header = f"{'样本':<10}" + ''.join(f"{name:>14}" for name, _ in parsers)
+    print(header)
+
+    for sample_name, text in FRONTMATTER_SAMPLES.items():
+        row = f"{sample_name:<10}"
+        for name, func in parsers:
+            if func is None or (name == '快速路径' and func(text) is None):
+                row += f"{'-':>14}"
+            else:
+                row += f"{time_per_call(func, text, iterations):>14.1f}"
+        print(row)
+
+# 合成笔记使用的文本素材
+ZH_SENTENCES = [
+    '今天整理了一下最近的阅读笔记，发现很多想法可以串联起来。',
+    '这个问题的关键在于如何定义边界条件。',
+    '会议上讨论了下个季度的计划和资源分配。',
+    '读完这本书之后，对长期主义有了新的理解。',
+    '周末去公园散步，顺便思考了工作流程的改进。',
+    '记录一个小技巧：先写提纲，再补充细节。',
+]
+EN_SENTENCES = [
+    'This note collects a few thoughts from the weekly review.',
+    'The main idea is to keep each step small and reversible.',
+    'We compared several options before choosing the simplest one.',
+    'Some references are listed below for later reading.',
+    'A short summary helps when revisiting the topic months later.',
+]
+
+def _random_paragraph(rng, zh_ratio):
+    """生成一段正文，按比例混入中英文句子和标签关键词"""
+    sentences = []
+    for _ in range(rng.randint(2, 6)):
+        pool = ZH_SENTENCES if rng.random() < zh_ratio else EN_SENTENCES
+        sentences.append(rng.choice(pool))
+        if rng.random() < 0.3:
+            sentences.append(rng.choice(rng.choice(list(KEYWORD_MAP.values()))))
+    return ' '.join(sentences)
+
+def generate_note(rng, index, size, frontmatter_ratio, midfile_ratio, zh_ratio):
+    """生成一篇合成笔记，返回 (文件名, 内容)"""
+    day = rng.randint(1, 28)
+    created = f"2025{rng.randint(1, 12):02d}{day:02d}{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}00"
+    title = f"{rng.choice(['笔记', 'Note', '读书', 'Meeting'])} {index}"
+
+    parts = [f"# {title}\n"]
+    target = max(size, 64) * rng.uniform(0.5, 1.5)
+    length = 0
+    while length < target:
+        paragraph = _random_paragraph(rng, zh_ratio)
+        if rng.random() < 0.1:
+            # 分隔线，用于测试正文 YAML 查找；多条分隔线之间、分隔线与正文 YAML 之间
+            # 的段落不应被当作 frontmatter
+            paragraph += '\n\n---'
+        parts.append(paragraph)
+        length += len(paragraph)
+    body = '\n\n'.join(parts) + '\n'
+
+    roll = rng.random()
+    if roll < frontmatter_ratio:
+        tags = rng.sample(list(KEYWORD_MAP), 3)
+        content = (f"---\ntitle: {title}\ndate_created: {created}\n"
+                   f"tags: [{', '.join(tags)}]\n---\n\n{body}")
+    elif roll < frontmatter_ratio + midfile_ratio:
+        paragraphs = body.split('\n\n')
+        cut = rng.randint(1, len(paragraphs))
+        yaml_block = f"\n---\ndate created: {created}\n---\n"
+        content = '\n\n'.join(paragraphs[:cut]) + yaml_block + '\n\n'.join(paragraphs[cut:])
+    else:
+        content = body
+
+    # 部分文件使用时间戳文件名并制造重名，覆盖重命名冲突路径
+    if rng.random() < 0.2:
+        filename = f"{created}.md"
+        if rng.random() < 0.5:
+            filename = f"{created} copy {index}.md"
+    else:
+        filename = f"note-{index:06d}.md"
+    return filename, content
+
+def generate_vault(target_dir, count, size=1500, frontmatter_ratio=0.5,
+                   midfile_ratio=0.1, zh_ratio=0.7, seed=42):
+    """在 target_dir 生成 count 篇合成笔记"""
+    rng = random.Random(seed)
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    for index in range(count):
+        filename, content = generate_note(rng, index, size, frontmatter_ratio, midfile_ratio, zh_ratio)
+        (target_dir / filename).write_text(content, encoding='utf-8')
+
+def run_normalizer(vault_dir, mode, extra_args):
+    """在子进程中运行 normalize_notes.py，返回 (耗时秒, 峰值内存MB, 出错文件数)
+
+    峰值内存取主进程与其子进程（--jobs 时的工作进程）中的最大值，需要 resource 模块。
+    出错文件数从标准化脚本的汇总输出（"错误: N 个文件"）中读取。
+    """
+    wrapper = (
+        "import resource, runpy, sys\n"
+        "sys.argv = sys.argv[1:]\n"
+        "try:\n"
+        "    runpy.run_path(sys.argv[0], run_name='__main__')\n"
+        "finally:\n"
+        "    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,\n"
+        "               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)\n"
+        "    sys.stderr.write(f'PEAK_RSS {peak}\\n')\n"
+    )
+    try:
+        import resource  # noqa: F401  仅用于判断平台是否支持
+        cmd = [sys.executable, '-c', wrapper, str(SCRIPT_PATH)]
+    except ImportError:
+        cmd = [sys.executable, str(SCRIPT_PATH)]
+    cmd += [mode, '--dir', str(vault_dir)] + extra_args
+
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+
+    peak_mb = None
+    for line in proc.stderr.splitlines():
+        if line.startswith('PEAK_RSS '):
+            peak = int(line.split()[1])
+            # Linux 以 KB 为单位，macOS 以字节为单位
+            peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    match = re.search(r'^错误: (\d+) 个文件', proc.stdout, re.MULTILINE)
+    errors = int(match.group(1)) if match else 0
+    return elapsed, peak_mb, errors
+
+def bench_functions(vault_dir, sample=500):
+    """对笔记库中的样本测量核心函数的单篇耗时（微秒）"""
+    contents = []
+    for filepath in sorted(Path(vault_dir).glob('*.md'))[:sample]:
+        contents.append(filepath.read_text(encoding='utf-8'))
+
+    parsed = [extract_yaml_frontmatter(content) for content in contents]
+    timings = {}
+
+    start = time.perf_counter()
+    for content in contents:
+        extract_yaml_frontmatter(content)
+    timings['extract_yaml_frontmatter'] = (time.perf_counter() - start) / len(contents) * 1e6
+
+    start = time.perf_counter()
+    for metadata, body in parsed:
+        title = metadata.get('title', '') if isinstance(metadata, dict) else ''
+        generate_tags_from_content(str(title), body)
+    timings['generate_tags_from_content'] = (time.perf_counter() - start) / len(contents) * 1e6
+
+    return timings
+
+def bench_vault(count, size, frontmatter_ratio, midfile_ratio, zh_ratio, jobs, seed):
+    """生成合成笔记库并测量 dry-run / execute 吞吐量"""
+    print(f"合成笔记库: {count} 篇，平均约 {size} 字符，frontmatter {frontmatter_ratio:.0%}，"
+          f"正文 YAML {midfile_ratio:.0%}，中文 {zh_ratio:.0%}")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory(prefix='normalize_bench_') as tmp:
+        source = Path(tmp) / 'source'
+        generate_vault(source, count, size, frontmatter_ratio, midfile_ratio, zh_ratio, seed)
+
+        for name, timing in bench_functions(source).items():
+            print(f"{name:<30}{timing:>10.1f} 微秒/篇")
+        print("-" * 60)
+
+        runs = [('dry-run', '--dry-run', [])]
+        if jobs > 1:
+            runs.append((f'dry-run --jobs {jobs}', '--dry-run', ['--jobs', str(jobs)]))
+        runs.append(('execute', '--execute', []))
+        if jobs > 1:
+            runs.append((f'execute --jobs {jobs}', '--execute', ['--jobs', str(jobs)]))
+
+        for label, mode, extra_args in runs:
+            # 每次 execute 都在新的副本上运行，避免前一次的重命名影响结果
+            vault = Path(tmp) / 'vault'
+            if vault.exists():
+                shutil.rmtree(vault)
+            shutil.copytree(source, vault)
+
+            elapsed, peak_mb, errors = run_normalizer(vault, mode, extra_args)
+            peak = f"{peak_mb:.1f} MB" if peak_mb is not None else '-'
+            # 吞吐量只计完整处理的笔记，出错的笔记提前中止，不计入
+            print(f"{label:<24}{elapsed:>8.2f} 秒{(count - errors) / elapsed:>10.0f} 文件/秒   "
+                  f"峰值内存 {peak}   出错 {errors} 篇")
+            if errors:
+                print(f"  ⚠️  {errors} 篇笔记处理出错，吞吐量只统计其余 {count - errors} 篇")
+
+def _get_option(name, default, cast):
+    """读取 --name VALUE 形式的参数"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return cast(sys.argv[idx + 1])
+    return default
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ('frontmatter', 'generate', 'vault'):
+        print("用法: python benchmark.py frontmatter [--iterations N]")
+        print("       python benchmark.py generate DIR [笔记库参数]")
+        print("       python benchmark.py vault [笔记库参数] [--jobs N]")
+        print("  frontmatter: frontmatter 解析路径微基准")
+        print("  generate: 在 DIR 生成合成笔记库")
+        print("  vault: 生成临时笔记库并测量 dry-run / execute 吞吐量和峰值内存")
+        print("  --iterations N: 每个样本的重复次数（默认 2000）")
+        print("笔记库参数:")
+        print("  --count N: 笔记数量（默认 2000）")
+        print("  --size N: 平均正文字符数（默认 1500）")
+        print("  --frontmatter-ratio R: 带开头 frontmatter 的比例（默认 0.5）")
+        print("  --midfile-ratio R: YAML 位于正文中的比例（默认 0.1）")
+        print("  --zh-ratio R: 中文句子比例（默认 0.7）")
+        print("  --seed N: 随机种子（默认 42）")
+        print("  --jobs N: 额外测量 --jobs N 并行模式")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == 'frontmatter':
+        bench_frontmatter(_get_option('--iterations', 2000, int))
+        return
+
+    vault_args = dict(
+        count=_get_option('--count', 2000, int),
+        size=_get_option('--size', 1500, int),
+        frontmatter_ratio=_get_option('--frontmatter-ratio', 0.5, float),
+        midfile_ratio=_get_option('--midfile-ratio', 0.1, float),
+        zh_ratio=_get_option('--zh-ratio', 0.7, float),
+        seed=_get_option('--seed', 42, int),
+    )
+
+    if command == 'generate':
+        if len(sys.argv) < 3 or sys.argv[2].startswith('--'):
+            print("❌ 请指定输出目录: python benchmark.py generate DIR")
+            sys.exit(1)
+        generate_vault(sys.argv[2], **vault_args)
+        print(f"✅ 已生成 {vault_args['count']} 篇笔记: {sys.argv[2]}")
+    else:
+        bench_vault(jobs=_get_option('--jobs', 1, int), **vault_args)
+
+if __name__ == "__main__":
+    main()
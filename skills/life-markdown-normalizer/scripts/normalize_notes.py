@@ -5,17 +5,145 @@
 - 添加/更新 YAML 元数据
 """
 
+import hashlib
+import json
 import os
 import re
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import yaml
 
+from note_dedup import DuplicateDetector, minhash_signature, write_duplicate_report
+from note_index import INDEX_NAME, NoteIndex
+from note_journal import JOURNAL_NAME, JOURNAL_SYNC_EVERY, RunJournal, recover, temp_path_for
+from note_watcher import create_watcher, watch
+
+try:
+    from yaml import CSafeLoader
+except ImportError:  # PyYAML 未编译 libyaml 扩展
+    CSafeLoader = None
+
 # 工作目录 - 使用当前工作目录或命令行参数指定
 NOTES_DIR = None  # 将在main函数中设置
 
+# 并行模式下每个任务包含的文件数，以及每个进程预取的任务数
+CHUNK_SIZE = 32
+PREFETCH_PER_WORKER = 4
+
+# 增量模式的清单文件（位于笔记目录下）
+MANIFEST_NAME = '.normalize_manifest.json'
+MANIFEST_VERSION = 1
+
+# 默认排除的目录（gitignore 风格，可用 --exclude 追加）
+DEFAULT_EXCLUDES = ['changelog/', '.claude/', '.git/', '.obsidian/', '.trash/']
+
+# 文件开头 frontmatter 的最大读取字节数；正文中查找 YAML 块的字符窗口
+FRONTMATTER_HEAD_MAX_BYTES = 64 * 1024
+FRONTMATTER_SEARCH_WINDOW = 16 * 1024
+
+# 扁平 frontmatter 快速解析：只接受 `key: value` / `key: [a, b, c]`，
+# 其余写法（注释、嵌套、多行、可能被 YAML 解析为非字符串的值）交给 PyYAML
+_FLAT_LINE_RE = re.compile(r'^([A-Za-z_][A-Za-z0-9_ ]*?) *:(?: +(.*?))? *$')
+_PLAIN_INDICATORS = set('-?:,[]{}#&*!|>\'"%@`=~.+<')
+_YAML_SPECIAL_WORDS = {
+    'y', 'n', 'yes', 'no', 'true', 'false', 'on', 'off', 'null', '~',
+}
+
+# 标签分类体系（关键词映射和默认标签）
+TAG_CATEGORIES_PATH = Path(__file__).resolve().parent.parent / 'references' / 'tag_categories.md'
+
+# 分类文件不可用时使用的内置关键词映射
+FALLBACK_KEYWORD_MAP = {
+    'AI': ['AI', 'LLM', 'Claude', 'GPT', '大模型', '人工智能', '机器学习', 'Transformer'],
+    '认知科学': ['认知', '学习', '记忆', '注意力', '思维', '心理', '大脑', '神经'],
+    '产品设计': ['产品', '设计', 'UX', 'UI', '用户体验', '交互'],
+    '商业': ['商业', '经济', '市场', '营销', '销售', '增长', 'GDP'],
+    '管理': ['管理', '组织', '团队', '领导', '项目', '协作'],
+    '技术': ['编程', '代码', '开发', '工程', '架构', 'Python', 'JavaScript', 'API'],
+    '数据': ['数据', '分析', '可视化', '统计', '指标'],
+    '教育': ['教育', '教学', '培训', '学校', '老师', '学生'],
+    '社会': ['社会', '文化', '历史', '政治', '人文'],
+    '哲学': ['哲学', '思考', '观点', '理论', '方法论'],
+    '工具': ['工具', '软件', '应用', '平台', 'App'],
+    '写作': ['写作', '文章', '笔记', '文档', '内容'],
+}
+FALLBACK_DEFAULT_TAGS = ['笔记', '知识管理', '思考', '学习', '总结']
+
+def _parse_flat_scalar(value, in_list=False):
+    """解析扁平写法中的单个标量；返回 (ok, value)"""
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        inner = value[1:-1]
+        if value[0] in inner or '\\' in inner:
+            return False, None
+        return True, inner
+
+    if not value or value[0] in _PLAIN_INDICATORS or value[0].isspace():
+        return False, None
+    if ':' in value or '#' in value:
+        return False, None
+    if in_list and any(ch in value for ch in ',[]{}'):
+        return False, None
+    if value.lower() in _YAML_SPECIAL_WORDS:
+        return False, None
+    if value[0].isdigit():
+        # 只接受十进制整数，日期、浮点、八进制等交给 PyYAML
+        if value.isdigit() and value.isascii() and (value == '0' or value[0] != '0'):
+            return True, int(value)
+        return False, None
+    return True, value
+
+def parse_flat_frontmatter(text):
+    """快速解析扁平 frontmatter，无法确定与 YAML 结果一致时返回 None"""
+    metadata = {}
+    for line in text.split('\n'):
+        if not line.strip():
+            continue
+        match = _FLAT_LINE_RE.match(line)
+        if not match or '\t' in line or not line.isprintable():
+            return None
+        key, value = match.group(1), match.group(2)
+        if key.lower() in _YAML_SPECIAL_WORDS:
+            return None
+
+        if not value:
+            metadata[key] = None
+        elif value[0] == '[':
+            if value[-1] != ']':
+                return None
+            inner = value[1:-1].strip()
+            items = []
+            if inner:
+                for raw in inner.split(','):
+                    ok, item = _parse_flat_scalar(raw.strip(), in_list=True)
+                    if not ok:
+                        return None
+                    items.append(item)
+            metadata[key] = items
+        else:
+            ok, metadata[key] = _parse_flat_scalar(value)
+            if not ok:
+                return None
+
+    return metadata or None
+
+def load_frontmatter_yaml(yaml_content):
+    """解析 frontmatter：扁平快速路径 → libyaml (CSafeLoader) → yaml.safe_load"""
+    metadata = parse_flat_frontmatter(yaml_content)
+    if metadata is not None:
+        return metadata
+    if CSafeLoader is not None:
+        return yaml.load(yaml_content, Loader=CSafeLoader)
+    return yaml.safe_load(yaml_content)
+
 def extract_yaml_frontmatter(content):
-    """提取 YAML frontmatter（可能在文件任意位置）"""
+    """提取 YAML frontmatter（可能在文件任意位置）
+
+    解析结果不是映射（如两条 --- 分隔线之间的普通段落被解析成字符串）时不算
+    frontmatter。
+    """
     # 尝试匹配文件开头的YAML
     pattern = r'^---\s*\n(.*?)\n---\s*\n'
     match = re.match(pattern, content, re.DOTALL)
@@ -23,58 +151,156 @@ def extract_yaml_frontmatter(content):
         yaml_content = match.group(1)
         body = content[match.end():]
         try:
-            metadata = yaml.safe_load(yaml_content)
-            return metadata, body
+            metadata = load_frontmatter_yaml(yaml_content)
+            if isinstance(metadata, dict):
+                return metadata, body
         except:
             pass
 
-    # 尝试在文件任意位置查找YAML
-    pattern = r'\n---\s*\n(.*?)\n---\s*\n'
-    match = re.search(pattern, content, re.DOTALL)
-    if match:
+    # 尝试在文件任意位置查找YAML（仅在开头窗口内查找，避免扫描整篇长文）
+    # 一对分隔线之间不是 YAML 映射时，以其中的第二条作为起点继续查找
+    pattern = re.compile(r'\n---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+    window = content[:FRONTMATTER_SEARCH_WINDOW]
+    match = pattern.search(window)
+    while match:
         yaml_content = match.group(1)
-        # 移除YAML块，保留其他内容
-        body = content[:match.start()] + content[match.end():]
         try:
-            metadata = yaml.safe_load(yaml_content)
-            return metadata, body
+            metadata = load_frontmatter_yaml(yaml_content)
         except:
-            pass
+            metadata = None
+        if isinstance(metadata, dict):
+            # 移除YAML块，保留其他内容
+            body = content[:match.start()] + content[match.end():]
+            return metadata, body
+        match = pattern.search(window, match.end(1))
 
     return {}, content
 
+def read_frontmatter_head(filepath, max_bytes=FRONTMATTER_HEAD_MAX_BYTES):
+    """只读取文件开头的 YAML frontmatter，不读取正文
+
+    文件不以 --- 开头、块未闭合、超出读取上限或解析失败时返回 None，
+    由调用方回退到完整读取。
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        first_line = f.readline()
+        if first_line.rstrip() != '---' or not first_line.endswith('\n'):
+            return None
+
+        lines = []
+        size = len(first_line)
+        for line in f:
+            size += len(line)
+            if size > max_bytes:
+                return None
+            if line.rstrip() == '---' and line.endswith('\n') and lines:
+                break
+            lines.append(line)
+        else:
+            return None
+
+    try:
+        metadata = load_frontmatter_yaml(''.join(lines))
+    except yaml.YAMLError:
+        return None
+    return metadata if isinstance(metadata, dict) else None
+
+def load_tag_taxonomy(path=TAG_CATEGORIES_PATH):
+    """从 tag_categories.md 读取标签→关键词映射和默认标签
+
+    文件缺失或解析不到内容时回退到内置映射。
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    except OSError:
+        return FALLBACK_KEYWORD_MAP, FALLBACK_DEFAULT_TAGS
+
+    keyword_map = {}
+    default_tags = []
+    current_tag = None
+    section = None  # 'keywords' | 'defaults' | None
+
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            current_tag = None
+            section = 'defaults' if stripped.lstrip('#').strip() == 'Default Tags' else None
+            continue
+
+        tag_match = re.match(r'^\*\*Tag\*\*:\s*`([^`]+)`', stripped)
+        if tag_match:
+            current_tag = tag_match.group(1).strip()
+            keyword_map.setdefault(current_tag, [])
+            section = None
+        elif stripped.startswith('**Keywords**'):
+            section = 'keywords' if current_tag else None
+        elif stripped.startswith('- ') and section == 'keywords':
+            for kw in stripped[2:].split(','):
+                kw = kw.strip()
+                if kw and kw not in keyword_map[current_tag]:
+                    keyword_map[current_tag].append(kw)
+        elif stripped.startswith('- ') and section == 'defaults':
+            default_tags.append(stripped[2:].strip())
+        elif stripped and section == 'keywords':
+            section = None
+
+    keyword_map = {tag: kws for tag, kws in keyword_map.items() if kws}
+    if not keyword_map:
+        return FALLBACK_KEYWORD_MAP, FALLBACK_DEFAULT_TAGS
+    return keyword_map, default_tags or FALLBACK_DEFAULT_TAGS
+
+class TagMatcher:
+    """多关键词标签匹配器
+
+    所有关键词编译为一个按长度降序的正则，单次扫描文本即可得到命中的关键词。
+    正则匹配互不重叠，可能被相邻命中"遮挡"的关键词（与已命中关键词重叠或为其子串）
+    在构建时预先算出，仅在遮挡者命中时再单独检查，结果与逐个子串查找完全一致。
+    """
+
+    def __init__(self, keyword_map):
+        self.tag_order = list(keyword_map)
+        self.keyword_tags = {}
+        for tag, keywords in keyword_map.items():
+            for kw in keywords:
+                self.keyword_tags.setdefault(kw, []).append(tag)
+
+        keywords = sorted(self.keyword_tags, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(kw) for kw in keywords))
+
+        # shadowed_by[kw]: 命中后可能遮挡 kw 的关键词集合
+        self.shadowed_by = {}
+        for kw in keywords:
+            shadows = set()
+            for other in keywords:
+                if other == kw:
+                    continue
+                if kw in other or any(other.endswith(kw[:i]) for i in range(1, len(kw))):
+                    shadows.add(other)
+            if shadows:
+                self.shadowed_by[kw] = shadows
+
+    def match_tags(self, text):
+        """返回文本命中的全部标签（集合）"""
+        found = set(self.pattern.findall(text))
+        for kw, shadows in self.shadowed_by.items():
+            if kw not in found and not shadows.isdisjoint(found) and kw in text:
+                found.add(kw)
+        return {tag for kw in found for tag in self.keyword_tags[kw]}
+
+KEYWORD_MAP, DEFAULT_TAGS = load_tag_taxonomy()
+TAG_MATCHER = TagMatcher(KEYWORD_MAP)
+
 def generate_tags_from_content(title, content):
     """根据标题和内容生成3个标签"""
-    tags = []
     text = title + ' ' + content[:500]  # 标题 + 前500字符
 
-    # 关键词到标签的映射
-    keyword_map = {
-        'AI': ['AI', 'LLM', 'Claude', 'GPT', '大模型', '人工智能', '机器学习', 'Transformer'],
-        '认知科学': ['认知', '学习', '记忆', '注意力', '思维', '心理', '大脑', '神经'],
-        '产品设计': ['产品', '设计', 'UX', 'UI', '用户体验', '交互'],
-        '商业': ['商业', '经济', '市场', '营销', '销售', '增长', 'GDP'],
-        '管理': ['管理', '组织', '团队', '领导', '项目', '协作'],
-        '技术': ['编程', '代码', '开发', '工程', '架构', 'Python', 'JavaScript', 'API'],
-        '数据': ['数据', '分析', '可视化', '统计', '指标'],
-        '教育': ['教育', '教学', '培训', '学校', '老师', '学生'],
-        '社会': ['社会', '文化', '历史', '政治', '人文'],
-        '哲学': ['哲学', '思考', '观点', '理论', '方法论'],
-        '工具': ['工具', '软件', '应用', '平台', 'App'],
-        '写作': ['写作', '文章', '笔记', '文档', '内容'],
-    }
-
-    # 匹配关键词
-    for tag, keywords in keyword_map.items():
-        if any(kw in text for kw in keywords):
-            if tag not in tags:
-                tags.append(tag)
-                if len(tags) >= 3:
-                    break
+    # 单次扫描匹配关键词，按分类顺序取前3个标签
+    matched = TAG_MATCHER.match_tags(text)
+    tags = [tag for tag in TAG_MATCHER.tag_order if tag in matched][:3]
 
     # 如果还不够3个，补充默认标签
-    default_tags = ['笔记', '知识管理', '思考', '学习', '总结']
-    for tag in default_tags:
+    for tag in DEFAULT_TAGS:
         if tag not in tags:
             tags.append(tag)
             if len(tags) >= 3:
@@ -102,8 +328,11 @@ def parse_timestamp_from_string(ts_str):
             continue
     return None
 
-def get_file_timestamps(filepath, metadata):
-    """获取文件的创建和修改时间"""
+def get_file_timestamps(filepath, metadata, stat=None):
+    """获取文件的创建和修改时间
+
+    stat 为目录扫描时已取得的 os.stat_result，缺省时按需调用一次 os.stat。
+    """
     created = None
     modified = None
 
@@ -117,10 +346,14 @@ def get_file_timestamps(filepath, metadata):
         if date_created_str:
             created = parse_timestamp_from_string(date_created_str)
 
-    # 3. 从文件系统获取
+    # 3. 从文件系统获取（Linux 等平台没有 st_birthtime，用 ctime/mtime 中较早者代替）
     if not created:
-        stat = os.stat(filepath)
-        created = datetime.fromtimestamp(stat.st_birthtime)
+        if stat is None:
+            stat = os.stat(filepath)
+        birthtime = getattr(stat, 'st_birthtime', None)
+        if birthtime is None:
+            birthtime = min(stat.st_ctime, stat.st_mtime)
+        created = datetime.fromtimestamp(birthtime)
 
     # 修改时间：优先YAML，然后文件系统
     if metadata:
@@ -129,7 +362,8 @@ def get_file_timestamps(filepath, metadata):
             modified = parse_timestamp_from_string(date_modified_str)
 
     if not modified:
-        stat = os.stat(filepath)
+        if stat is None:
+            stat = os.stat(filepath)
         modified = datetime.fromtimestamp(stat.st_mtime)
 
     return created, modified
@@ -191,19 +425,10 @@ tags: {metadata['tags']}
 """
     return yaml_content
 
-def process_file(filepath):
-    """处理单个文件"""
-    print(f"处理: {filepath.name}")
-
-    # 读取文件内容
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # 提取现有元数据
-    metadata, body = extract_yaml_frontmatter(content)
-
+def build_metadata(filepath, metadata, body, stat=None):
+    """根据现有元数据和正文生成标准元数据和新文件名"""
     # 获取文件时间戳
-    created, modified = get_file_timestamps(filepath, metadata)
+    created, modified = get_file_timestamps(filepath, metadata, stat)
 
     # 提取标题
     title = extract_title(filepath, metadata, body)
@@ -226,11 +451,311 @@ def process_file(filepath):
     # 生成新的文件名（时间戳格式）
     new_filename = f"{format_timestamp(created)}.md"
 
+    return new_metadata, new_filename
+
+def has_complete_metadata(metadata):
+    """标题和至少3个标签都已存在，生成元数据时无需正文"""
+    tags = metadata.get('tags')
+    return bool(metadata.get('title')) and isinstance(tags, list) and len(tags) >= 3
+
+def preview_file(filepath, stat=None):
+    """预览模式快速路径：frontmatter 已完整时只读取文件头
+
+    返回 (new_metadata, new_filename, None)；需要正文时返回 None。
+    """
+    metadata = read_frontmatter_head(filepath)
+    if metadata is None or not has_complete_metadata(metadata):
+        return None
+    new_metadata, new_filename = build_metadata(filepath, metadata, '', stat)
+    return new_metadata, new_filename, None
+
+def process_file(filepath, content=None, stat=None):
+    """处理单个文件"""
+    # 读取文件内容
+    if content is None:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+    # 提取现有元数据
+    metadata, body = extract_yaml_frontmatter(content)
+    new_metadata, new_filename = build_metadata(filepath, metadata, body, stat)
+
     # 生成新的文件内容
-    new_content = generate_file_content(new_metadata, body, title)
+    new_content = generate_file_content(new_metadata, body, new_metadata['title'])
 
     return new_metadata, new_filename, new_content
 
+def content_hash(content):
+    """计算文本内容的 SHA-256"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _process_chunk(entries, preview=False, dedup=False):
+    """进程池任务：处理一组 (filepath, stat)，异常按文件捕获，交给协调进程统一输出
+
+    preview 为 True 时优先走只读文件头的快速路径，此时 sha256 为 None；
+    dedup 为 True 时额外计算清理后正文的 MinHash 签名（需要读取全文）。
+    """
+    results = []
+    for filepath, stat in entries:
+        item = {'filepath': filepath, 'stat': stat, 'result': None, 'error': None,
+                'sha256': None, 'identical': False, 'signature': None}
+        try:
+            if preview and not dedup:
+                item['result'] = preview_file(filepath, stat)
+                if item['result'] is not None:
+                    results.append(item)
+                    continue
+            with open(filepath, 'r', encoding='utf-8') as f:
+                content = f.read()
+            item['sha256'] = content_hash(content)
+            item['result'] = process_file(filepath, content, stat)
+            item['identical'] = item['result'][2] == content
+            if dedup:
+                _, body = extract_yaml_frontmatter(content)
+                title = item['result'][0]['title']
+                item['signature'] = minhash_signature(clean_body_content(body, title))
+        except Exception as e:
+            item['error'] = str(e)
+        results.append(item)
+    return results
+
+def iter_processed(md_entries, jobs=1, preview=False, dedup=False):
+    """按原始顺序产出处理结果（字典：filepath/stat/result/error/sha256/identical/signature）
+
+    jobs > 1 时将 process_file 分块交给进程池执行，结果仍按提交顺序返回，
+    保证重命名冲突处理和变更清单与串行模式完全一致。
+    """
+    if jobs <= 1:
+        for entry in md_entries:
+            yield from _process_chunk([entry], preview, dedup)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        chunk = []
+        for entry in md_entries:
+            chunk.append(entry)
+            if len(chunk) >= CHUNK_SIZE:
+                pending.append(pool.submit(_process_chunk, chunk, preview, dedup))
+                chunk = []
+                # 限制在途任务数量，避免一次性提交全部文件
+                if len(pending) >= jobs * PREFETCH_PER_WORKER:
+                    yield from pending.popleft().result()
+        if chunk:
+            pending.append(pool.submit(_process_chunk, chunk, preview, dedup))
+        while pending:
+            yield from pending.popleft().result()
+
+def _glob_to_regex(pattern):
+    """将 gitignore 风格的通配符转换为正则（* 不跨目录，** 跨目录）"""
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            regex += '[' + body.replace('\\', '\\\\') + ']'
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+def compile_exclude_patterns(patterns):
+    """编译 gitignore 风格的排除模式，返回 [(regex, dir_only, negate)]
+
+    - 不含 / 的模式匹配任意层级的文件或目录名
+    - 含 / 的模式相对笔记目录匹配
+    - 以 / 结尾只匹配目录，以 ! 开头表示重新包含，后出现的模式优先
+    """
+    compiled = []
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith('#'):
+            continue
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        regex = _glob_to_regex(pattern.lstrip('/'))
+        if not anchored:
+            regex = '(?:.*/)?' + regex
+        compiled.append((re.compile(regex), dir_only, negate))
+    return compiled
+
+def is_excluded(rel_path, is_dir, compiled_excludes):
+    """判断相对路径是否被排除（最后一个匹配的模式生效）"""
+    excluded = False
+    for regex, dir_only, negate in compiled_excludes:
+        if dir_only and not is_dir:
+            continue
+        if regex.fullmatch(rel_path):
+            excluded = not negate
+    return excluded
+
+def iter_note_entries(notes_dir, recursive=False, compiled_excludes=(), dir_names=None):
+    """流式遍历笔记，逐个产出 (filepath, stat)
+
+    每个目录只做一次 os.scandir，目录内的文件连续产出后再进入子目录；
+    dir_names（按遍历顺序的字典）记录各目录已占用的文件名，供重命名冲突判断。
+    全部路径不会一次性加载到内存。
+    """
+    stack = [notes_dir]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as it:
+            entries = list(it)
+
+        rel_dir = directory.relative_to(notes_dir).as_posix()
+        prefix = '' if rel_dir == '.' else rel_dir + '/'
+        if dir_names is not None:
+            dir_names[directory] = {entry.name for entry in entries}
+
+        subdirs = []
+        for entry in entries:
+            rel_path = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and not is_excluded(rel_path, True, compiled_excludes):
+                    subdirs.append(directory / entry.name)
+                continue
+            if not entry.name.endswith('.md') or not entry.is_file():
+                continue
+            if is_excluded(rel_path, False, compiled_excludes):
+                continue
+            yield directory / entry.name, entry.stat()
+
+        stack.extend(reversed(subdirs))
+
+def resolve_filename_conflict(new_filename, filepath, existing_names):
+    """文件名已被占用时追加序号，基于内存中的文件名集合判断，不访问文件系统"""
+    if new_filename == filepath.name or new_filename not in existing_names:
+        return new_filename
+    base_name = new_filename[:-3]  # 移除 .md
+    counter = 1
+    while new_filename in existing_names:
+        new_filename = f"{base_name}_{counter}.md"
+        counter += 1
+    return new_filename
+
+def write_file_atomic(filepath, content, old_stat=None):
+    """先写入同目录临时文件，再原子替换目标文件，返回新文件的 stat
+
+    临时文件沿用原文件的权限位（old_stat 为原文件的 stat），并在替换前 fsync，
+    断电后不会留下空的笔记。
+    """
+    if old_stat is None:
+        old_stat = os.stat(filepath)
+    tmp_path = temp_path_for(filepath)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(tmp_path, old_stat.st_mode & 0o7777)
+    stat = os.stat(tmp_path)
+    os.replace(tmp_path, filepath)
+    return stat
+
+def note_key(filepath):
+    """笔记的标识：相对笔记目录的路径（清单、日志中使用）"""
+    return filepath.relative_to(NOTES_DIR).as_posix()
+
+def load_manifest(notes_dir):
+    """读取增量清单，不存在或版本不符时返回空清单"""
+    manifest_path = notes_dir / MANIFEST_NAME
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'files': {}}
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    return manifest
+
+def save_manifest(notes_dir, manifest):
+    """原子写入增量清单"""
+    manifest_path = notes_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, manifest_path)
+
+def prune_manifest(manifest, seen_keys):
+    """删除本次完整扫描未见到的笔记（已删除或被外部重命名）的清单记录"""
+    for key in [key for key in manifest['files'] if key not in seen_keys]:
+        del manifest['files'][key]
+
+def is_unchanged(filepath, stat, manifest):
+    """根据大小和修改时间判断文件自上次运行后是否未变（不打开文件）"""
+    entry = manifest['files'].get(note_key(filepath))
+    if not entry:
+        return False
+    return entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+
+def record_manifest(manifest, filepath, stat, sha256, metadata):
+    """记录文件当前状态到清单"""
+    manifest['files'][note_key(filepath)] = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'metadata': metadata,
+    }
+
+def write_changelog(notes_dir, rename_log):
+    """生成文件名变更清单，返回清单路径"""
+    changelog_dir = notes_dir / 'changelog'
+    changelog_dir.mkdir(exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    changelog_file = changelog_dir / f'文件名变更清单_{timestamp}.md'
+
+    with open(changelog_file, 'w', encoding='utf-8') as f:
+        f.write(f"# 文件名变更清单\n\n")
+        f.write(f"**生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"**变更数量**: {len(rename_log)} 个文件\n\n")
+        f.write("---\n\n")
+        f.write("## 变更列表\n\n")
+        f.write("| 原文件名 | 新文件名 | 标题 | 创建时间 |\n")
+        f.write("|---------|---------|------|----------|\n")
+
+        for item in rename_log:
+            f.write(f"| {item['old_name']} | {item['new_name']} | {item['title']} | {item['date']} |\n")
+
+    return changelog_file
+
+def resume_run(notes_dir):
+    """根据运行日志补完或回退中断的执行，并补写变更清单"""
+    if not RunJournal.exists(notes_dir):
+        print(f"未发现运行日志（{JOURNAL_NAME}），无需恢复")
+        return
+
+    stats, rename_log = recover(notes_dir)
+    print(f"补完操作: {stats['replayed']} 个，放弃未完成操作: {stats['rolled_back']} 个")
+    if stats['conflicts']:
+        print(f"⚠️  {stats['conflicts']} 个重命名目标已被占用，保持原文件名")
+
+    if rename_log:
+        changelog_file = write_changelog(notes_dir, rename_log)
+        print(f"\n✅ 文件名变更清单已生成: {changelog_file}")
+        print(f"   共记录 {len(rename_log)} 个文件的重命名操作")
+    print("增量清单和索引未包含中断的运行，下次执行时会重新处理相关文件")
+
 def main():
     """主函数"""
     import sys
@@ -238,16 +763,34 @@ def main():
 
     # 检查命令行参数
     if len(sys.argv) < 2:
-        print("用法: python normalize_notes.py [--dry-run|--execute] [--dir PATH] [--limit N]")
+        print("用法: python normalize_notes.py [--dry-run|--execute|--resume] [--dir PATH] [--limit N] [--jobs N] [--incremental]")
+        print("                                 [--recursive] [--exclude PATTERN]... [--index] [--dedup] [--watch [--poll]]")
         print("  --dry-run: 预览模式，不实际修改文件")
         print("  --execute: 执行模式，实际修改文件")
+        print(f"  --resume: 恢复中断的执行（根据 {JOURNAL_NAME} 补完或回退未完成的操作）")
         print("  --dir PATH: 指定工作目录（默认为当前目录）")
         print("  --limit N: 只处理前N个文件（用于测试）")
+        print("  --jobs N: 使用N个进程并行解析（默认1，串行）")
+        print(f"  --incremental: 增量模式，跳过自上次运行后未变更的文件（清单: {MANIFEST_NAME}）")
+        print("  --recursive: 递归处理子目录")
+        print(f"  --exclude PATTERN: 排除匹配的路径（gitignore 风格，可重复；默认: {' '.join(DEFAULT_EXCLUDES)}）")
+        print(f"  --index: 执行模式下维护标签/日期索引（{INDEX_NAME}，用 note_index.py 查询）")
+        print("  --dedup: 用 MinHash/LSH 检测近似重复笔记，执行模式下生成重复笔记报告（与 --incremental 同用时仍读取全部文件）")
+        print("  --watch: 持续监听目录，只处理新建或修改的笔记（inotify，不可用时轮询）")
+        print("  --poll: 监听模式下强制使用轮询")
         sys.exit(1)
 
     mode = sys.argv[1]
     limit = None
     work_dir = None
+    jobs = 1
+    incremental = '--incremental' in sys.argv
+    recursive = '--recursive' in sys.argv
+    build_index = '--index' in sys.argv and mode == '--execute'
+    dedup = '--dedup' in sys.argv
+    watch = '--watch' in sys.argv
+    poll = '--poll' in sys.argv
+    excludes = list(DEFAULT_EXCLUDES)
 
     # 解析命令行参数
     if '--limit' in sys.argv:
@@ -260,6 +803,15 @@ def main():
         if dir_idx + 1 < len(sys.argv):
             work_dir = sys.argv[dir_idx + 1]
 
+    if '--jobs' in sys.argv:
+        jobs_idx = sys.argv.index('--jobs')
+        if jobs_idx + 1 < len(sys.argv):
+            jobs = max(1, int(sys.argv[jobs_idx + 1]))
+
+    for idx, arg in enumerate(sys.argv):
+        if arg == '--exclude' and idx + 1 < len(sys.argv):
+            excludes.append(sys.argv[idx + 1])
+
     # 设置工作目录
     if work_dir:
         NOTES_DIR = Path(work_dir)
@@ -268,106 +820,341 @@ def main():
 
     print(f"工作目录: {NOTES_DIR}")
 
-    # 获取所有 markdown 文件（排除特殊目录）
-    md_files = []
-    for f in NOTES_DIR.glob("*.md"):
-        # 排除changelog目录和.claude目录中的文件
-        if 'changelog' not in str(f) and '.claude' not in str(f):
-            md_files.append(f)
+    if mode == '--resume':
+        resume_run(NOTES_DIR)
+        return
 
-    print(f"找到 {len(md_files)} 个笔记文件")
+    if mode == '--execute' and RunJournal.exists(NOTES_DIR):
+        print(f"❌ 发现未完成运行的日志: {NOTES_DIR / JOURNAL_NAME}")
+        print("   请先运行 --resume 恢复后再执行")
+        sys.exit(1)
 
+    options = {
+        'mode': mode,
+        'limit': limit,
+        'jobs': jobs,
+        'incremental': incremental,
+        'recursive': recursive,
+        'build_index': build_index,
+        'dedup': dedup,
+        'compiled_excludes': compile_exclude_patterns(excludes),
+        'poll': poll,
+    }
+    if watch:
+        watch_notes(options)
+    else:
+        run_normalization(options)
+
+def run_normalization(options, entries=None):
+    """执行一轮标准化
+
+    entries 为 None 时流式遍历整个笔记目录；否则只处理给定的 (filepath, stat)
+    列表（监听模式下的一批变更），此时不清理索引中未出现的笔记。
+    """
+    mode = options['mode']
+    limit = options['limit']
+    jobs = options['jobs']
+    incremental = options['incremental']
+    recursive = options['recursive']
+    build_index = options['build_index']
+    dedup = options['dedup']
+    compiled_excludes = options['compiled_excludes']
+
+    # 流式获取 markdown 文件及其 stat（排除特殊目录），同时按目录记录已占用的文件名
+    dir_names = {}
+    if entries is None:
+        entries = iter_note_entries(NOTES_DIR, recursive, compiled_excludes, dir_names)
+        full_scan = True
+    else:
+        full_scan = False
+    found = 0
+    skipped = 0
+    manifest = load_manifest(NOTES_DIR) if incremental else None
+    index = NoteIndex.load(NOTES_DIR) if build_index else None
+    seen_keys = set()  # 本次扫描到的笔记，用于清理清单和索引中已删除的文件
+
+    def iter_candidates():
+        nonlocal found, skipped
+        for filepath, stat in entries:
+            found += 1
+            if index is not None or manifest is not None:
+                seen_keys.add(note_key(filepath))
+            # 增量模式：大小和修改时间均未变化的文件直接跳过，不打开；
+            # 查重需要全库笔记的签名，此时仍读取文件，由下方的内容哈希比较跳过写入
+            if manifest is not None and not dedup and is_unchanged(filepath, stat, manifest):
+                skipped += 1
+                continue
+            yield filepath, stat
+
+    md_entries = iter_candidates()
     if limit:
-        md_files = md_files[:limit]
+        md_entries = islice(md_entries, limit)
         print(f"限制处理前 {limit} 个文件")
 
     print(f"\n模式: {mode}")
+    if recursive:
+        print("递归处理子目录")
+    if incremental:
+        print("增量模式: 跳过未变更文件" + ("（查重模式下仍读取全部文件计算签名）" if dedup else ""))
+    if jobs > 1:
+        print(f"并行进程: {jobs}")
     print("=" * 60)
 
     # 处理每个文件
     processed = 0
     errors = 0
+    untouched = 0  # 内容和文件名均无变化
+    rewritten = 0
+    renamed = 0
     rename_log = []  # 记录文件重命名信息
-
-    for filepath in md_files:
-        try:
-            metadata, new_filename, new_content = process_file(filepath)
-            print(f"  标题: {metadata['title']}")
-            print(f"  标签: {metadata['tags']}")
-            print(f"  原文件名: {filepath.name}")
-            print(f"  新文件名: {new_filename}")
-
+    current_dir = None
+    existing_names = set()
+
+    # 执行模式：每个文件先生成计划，整批写入运行日志并 fsync 一次后再执行
+    journal = None
+    if mode == '--execute':
+        journal = RunJournal(NOTES_DIR)
+        journal.open()
+    batch = []  # [(输出行, 计划或 None)]
+    detector = DuplicateDetector() if dedup else None
+
+    def apply_plan(plan, lines):
+        """执行单个文件的写入和重命名，并更新清单、索引和日志"""
+        nonlocal processed, untouched, rewritten, renamed
+        filepath = plan['filepath']
+        new_filepath = plan['new_filepath']
+        metadata = plan['metadata']
+        new_stat = plan['stat']
+
+        # 内容有变化时才写入（临时文件 + 原子替换）
+        if plan['content'] is None:
+            if filepath == new_filepath:
+                untouched += 1
+                lines.append(f"  ✅ 内容无变化，未写入")
+        else:
+            new_stat = write_file_atomic(filepath, plan['content'], plan['stat'])
+            rewritten += 1
+
+        # 如果需要重命名
+        if filepath != new_filepath:
+            # 记录重命名信息
+            rename_log.append({
+                'old_name': note_key(filepath),
+                'new_name': note_key(new_filepath),
+                'title': metadata['title'],
+                'date': metadata['date_created']
+            })
+            filepath.rename(new_filepath)
+            renamed += 1
+            lines.append(f"  ✅ 已更新并重命名")
+        elif plan['content'] is not None:
+            lines.append(f"  ✅ 已更新")
+
+        if manifest is not None:
+            manifest['files'].pop(note_key(filepath), None)
+            record_manifest(manifest, new_filepath, new_stat, plan['sha256'], metadata)
+
+        if index is not None:
+            index.remove(note_key(filepath))
+            index.update(note_key(new_filepath), metadata)
+        seen_keys.discard(note_key(filepath))
+        seen_keys.add(note_key(new_filepath))
+
+        processed += 1
+
+    def flush_batch():
+        """先把整批计划写入运行日志（一次 fsync），再依次执行并输出"""
+        nonlocal errors
+        if journal is not None:
+            for _, plan in batch:
+                if plan is not None and (plan['content'] is not None
+                                         or plan['filepath'] != plan['new_filepath']):
+                    plan['seq'] = journal.plan(
+                        note_key(plan['filepath']),
+                        plan['sha256'] if plan['content'] is not None else None,
+                        note_key(plan['new_filepath']) if plan['filepath'] != plan['new_filepath'] else None,
+                        plan['metadata']['title'],
+                        plan['metadata']['date_created'],
+                    )
+            journal.sync()
+
+        for lines, plan in batch:
+            if plan is not None:
+                try:
+                    apply_plan(plan, lines)
+                    if plan.get('seq'):
+                        journal.done(plan['seq'])
+                except Exception as e:
+                    lines.append(f"  ❌ 错误: {e}")
+                    errors += 1
+            print('\n'.join(lines))
+            print()
+        batch.clear()
+
+    # 解析在工作进程中完成，冲突处理、写入和日志均在此串行执行
+    for item in iter_processed(md_entries, jobs, preview=mode != '--execute', dedup=dedup):
+        filepath = item['filepath']
+        lines = [f"处理: {note_key(filepath)}"]
+        plan = None
+
+        # 结果按目录连续到达，切换目录时释放已处理目录的文件名集合
+        if filepath.parent != current_dir:
+            current_dir = filepath.parent
+            while dir_names and next(iter(dir_names)) != current_dir:
+                del dir_names[next(iter(dir_names))]
+            if current_dir not in dir_names:
+                # 给定条目时目录未经扫描，首次遇到时读取一次文件名
+                dir_names[current_dir] = set(os.listdir(current_dir))
+            existing_names = dir_names[current_dir]
+
+        if item['error'] is not None:
+            lines.append(f"  ❌ 错误: {item['error']}")
+            errors += 1
+        elif manifest is not None and item['sha256'] is not None and (
+                manifest['files'].get(note_key(filepath), {}).get('sha256') == item['sha256']):
+            # 内容与清单记录一致（仅被 touch 过），输出不会变化，跳过
+            entry = manifest['files'][note_key(filepath)]
+            lines.append(f"  内容未变更，跳过")
+            skipped += 1
             if mode == '--execute':
-                # 实际执行文件更新
-                new_filepath = filepath.parent / new_filename
-
-                # 检查文件名冲突，如果冲突则添加序号
-                if new_filepath != filepath and new_filepath.exists():
-                    # 生成带序号的文件名
-                    base_name = new_filename[:-3]  # 移除 .md
-                    counter = 1
-                    while new_filepath.exists():
-                        new_filename = f"{base_name}_{counter}.md"
-                        new_filepath = filepath.parent / new_filename
-                        counter += 1
-                    print(f"  ⚠️  文件名冲突，使用: {new_filename}")
-
-                # 写入新内容
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-
-                # 如果需要重命名
-                if filepath.name != new_filename:
-                    # 记录重命名信息
-                    rename_log.append({
-                        'old_name': filepath.name,
-                        'new_name': new_filename,
-                        'title': metadata['title'],
-                        'date': metadata['date_created']
-                    })
-                    filepath.rename(new_filepath)
-                    print(f"  ✅ 已更新并重命名")
-                else:
-                    print(f"  ✅ 已更新")
+                record_manifest(manifest, filepath, item['stat'], item['sha256'], entry['metadata'])
+                if index is not None and note_key(filepath) not in index.notes:
+                    index.update(note_key(filepath), entry['metadata'])
+            if detector is not None:
+                detector.add(note_key(filepath), entry['metadata']['title'], item['signature'])
+        else:
+            metadata, new_filename, new_content = item['result']
+            lines.append(f"  标题: {metadata['title']}")
+            lines.append(f"  标签: {metadata['tags']}")
+            lines.append(f"  原文件名: {filepath.name}")
+            lines.append(f"  新文件名: {new_filename}")
 
-                processed += 1
+            if mode == '--execute':
+                # 检查文件名冲突，如果冲突则添加序号（按计划顺序占用文件名）
+                resolved_filename = resolve_filename_conflict(new_filename, filepath, existing_names)
+                if resolved_filename != new_filename:
+                    new_filename = resolved_filename
+                    lines.append(f"  ⚠️  文件名冲突，使用: {new_filename}")
+                if new_filename != filepath.name:
+                    existing_names.discard(filepath.name)
+                    existing_names.add(new_filename)
+
+                plan = {
+                    'filepath': filepath,
+                    'new_filepath': filepath.parent / new_filename,
+                    'metadata': metadata,
+                    'content': None if item['identical'] else new_content,
+                    'sha256': content_hash(new_content),
+                    'stat': item['stat'],
+                }
             else:
-                print(f"  [预览模式，未实际修改]")
+                lines.append(f"  [预览模式，未实际修改]")
                 processed += 1
 
-            print()
-        except Exception as e:
-            print(f"  ❌ 错误: {e}")
-            print()
-            errors += 1
+            if detector is not None:
+                final_path = plan['new_filepath'] if plan else filepath
+                detector.add(note_key(final_path), metadata['title'], item['signature'])
+
+        batch.append((lines, plan))
+        if journal is None or len(batch) >= JOURNAL_SYNC_EVERY:
+            flush_batch()
+
+    flush_batch()
 
     print("=" * 60)
+    print(f"找到 {found} 个笔记文件")
     print(f"处理完成: {processed} 个文件")
+    if skipped > 0:
+        print(f"跳过未变更: {skipped} 个文件")
+    if mode == '--execute':
+        print(f"未改动: {untouched} 个文件，已重写: {rewritten} 个文件，已重命名: {renamed} 个文件")
     if errors > 0:
         print(f"错误: {errors} 个文件")
 
+    if mode == '--execute' and manifest is not None:
+        if full_scan and not limit:
+            prune_manifest(manifest, seen_keys)
+        save_manifest(NOTES_DIR, manifest)
+
+    # 更新索引：增量模式下未打开的文件从清单补齐元数据（清单中已删除的笔记不补）；
+    # 完整扫描时清理已删除的文件
+    if index is not None:
+        if manifest is not None:
+            for key, entry in manifest['files'].items():
+                if key not in index.notes and (key in seen_keys or (NOTES_DIR / key).exists()):
+                    index.update(key, entry['metadata'])
+        if full_scan and not limit:
+            index.prune(seen_keys)
+        index.save(NOTES_DIR)
+        print(f"\n✅ 笔记索引已更新: {NOTES_DIR / INDEX_NAME}（{len(index.notes)} 篇）")
+
     # 生成文件名变更清单
     if mode == '--execute' and rename_log:
-        changelog_dir = NOTES_DIR / 'changelog'
-        changelog_dir.mkdir(exist_ok=True)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        changelog_file = changelog_dir / f'文件名变更清单_{timestamp}.md'
-
-        with open(changelog_file, 'w', encoding='utf-8') as f:
-            f.write(f"# 文件名变更清单\n\n")
-            f.write(f"**生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"**变更数量**: {len(rename_log)} 个文件\n\n")
-            f.write("---\n\n")
-            f.write("## 变更列表\n\n")
-            f.write("| 原文件名 | 新文件名 | 标题 | 创建时间 |\n")
-            f.write("|---------|---------|------|----------|\n")
-
-            for item in rename_log:
-                f.write(f"| {item['old_name']} | {item['new_name']} | {item['title']} | {item['date']} |\n")
-
+        changelog_file = write_changelog(NOTES_DIR, rename_log)
         print(f"\n✅ 文件名变更清单已生成: {changelog_file}")
         print(f"   共记录 {len(rename_log)} 个文件的重命名操作")
 
+    # 近似重复笔记
+    if detector is not None:
+        clusters = detector.clusters()
+        print(f"\n近似重复笔记: {len(clusters)} 组，共 {sum(len(group) for group in clusters)} 个文件")
+        if mode == '--execute' and clusters:
+            report_file = write_duplicate_report(NOTES_DIR, clusters)
+            print(f"✅ 重复笔记报告已生成: {report_file}")
+        elif clusters:
+            for group in clusters[:10]:
+                print(f"  - {', '.join(key for key, _ in group)}")
+
+    # 清单、索引和变更清单都已落盘，运行日志可以删除
+    if journal is not None:
+        journal.finish()
+
+def watch_notes(options):
+    """监听模式：只对新建或修改的笔记执行标准化，变更经防抖后成批处理
+
+    执行模式下强制使用清单，自身写入和重命名触发的事件会因 stat 与清单一致而被忽略。
+    """
+    compiled_excludes = options['compiled_excludes']
+    options = dict(options, limit=None, dedup=False)
+    if options['mode'] == '--execute':
+        options['incremental'] = True
+
+    def accept_dir(path):
+        return not is_excluded(note_key(path), True, compiled_excludes)
+
+    def scan():
+        return iter_note_entries(NOTES_DIR, options['recursive'], compiled_excludes)
+
+    def on_batch(paths):
+        if paths is None:
+            print("⚠️  事件队列溢出，执行一次完整扫描")
+            run_normalization(options)
+            return
+        manifest = load_manifest(NOTES_DIR) if options['incremental'] else None
+        entries = []
+        for filepath in paths:
+            if is_excluded(note_key(filepath), False, compiled_excludes):
+                continue
+            try:
+                stat = filepath.stat()
+            except FileNotFoundError:
+                continue  # 已被删除或再次重命名
+            if manifest is not None and is_unchanged(filepath, stat, manifest):
+                continue
+            entries.append((filepath, stat))
+        if entries:
+            print(f"\n检测到 {len(entries)} 个新建或修改的笔记")
+            run_normalization(options, entries)
+
+    watcher = create_watcher(NOTES_DIR, options['recursive'], accept_dir, scan,
+                             polling=options['poll'])
+    print(f"\n监听中（{type(watcher).__name__}），按 Ctrl+C 退出...")
+    try:
+        watch(watcher, on_batch)
+    except KeyboardInterrupt:
+        print("\n已停止监听")
+    finally:
+        watcher.close()
+
 if __name__ == "__main__":
     main()
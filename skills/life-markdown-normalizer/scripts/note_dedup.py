@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+近似重复笔记检测
+- 对清理后的正文计算 MinHash 签名（单次哈希 + 分桶的 one-permutation 变体）
+- LSH 分段分桶，只比较落入同一桶的笔记，整体近似线性
+"""
+
+import re
+import zlib
+from array import array
+from datetime import datetime
+
+# 签名分桶数、LSH 分段数（每段行数 = NUM_BINS // LSH_BANDS）
+NUM_BINS = 64
+LSH_BANDS = 8
+ROWS_PER_BAND = NUM_BINS // LSH_BANDS
+
+# 按 UTF-8 字节切分的 shingle 长度（约 4 个汉字或 12 个英文字符）
+SHINGLE_BYTES = 12
+
+# 估计的 Jaccard 相似度达到该值才视为重复；正文过短的笔记不参与检测
+DUPLICATE_THRESHOLD = 0.8
+MIN_DEDUP_CHARS = 50
+
+# 每个桶最多保留的笔记数，避免大量空白模板笔记导致桶内比较退化
+MAX_BUCKET_SIZE = 32
+
+_EMPTY_BIN = 0xFFFFFFFF
+_BIN_BITS = NUM_BINS.bit_length() - 1
+
+def minhash_signature(text):
+    """计算正文的 MinHash 签名（array('I')，长度 NUM_BINS）；正文过短时返回 None"""
+    normalized = re.sub(r'\s+', '', text).lower()
+    if len(normalized) < MIN_DEDUP_CHARS:
+        return None
+
+    data = normalized.encode('utf-8')
+    shingles = {data[i:i + SHINGLE_BYTES] for i in range(len(data) - SHINGLE_BYTES + 1)}
+
+    # 一次哈希：低位决定分桶，高位作为桶内取最小值的哈希
+    mins = [_EMPTY_BIN] * NUM_BINS
+    mask = NUM_BINS - 1
+    for h in map(zlib.crc32, shingles):
+        b = h & mask
+        v = h >> _BIN_BITS
+        if v < mins[b]:
+            mins[b] = v
+
+    # 空桶向右借用最近的非空桶（加上距离偏移），保证签名可比
+    filled = [i for i, v in enumerate(mins) if v != _EMPTY_BIN]
+    if len(filled) < NUM_BINS:
+        for i in range(NUM_BINS):
+            if mins[i] == _EMPTY_BIN:
+                for dist in range(1, NUM_BINS):
+                    v = mins[(i + dist) & mask]
+                    if v != _EMPTY_BIN and v < (1 << (32 - _BIN_BITS)):
+                        mins[i] = v + (dist << (32 - _BIN_BITS))
+                        break
+    return array('I', mins)
+
+def estimate_similarity(sig_a, sig_b):
+    """两个签名相等分桶的比例，即 Jaccard 相似度的估计"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_BINS
+
+class DuplicateDetector:
+    """增量加入笔记签名，按 LSH 桶找候选并用并查集聚类"""
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.keys = []
+        self.titles = []
+        self.signatures = []
+        self.parent = []
+        self.buckets = {}
+
+    def _find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def add(self, key, title, signature):
+        """加入一篇笔记，与同桶且足够相似的笔记合并到同一组"""
+        if signature is None:
+            return
+        idx = len(self.keys)
+        self.keys.append(key)
+        self.titles.append(title)
+        self.signatures.append(signature)
+        self.parent.append(idx)
+
+        checked = set()
+        for band in range(LSH_BANDS):
+            start = band * ROWS_PER_BAND
+            bucket_key = (band, signature[start:start + ROWS_PER_BAND].tobytes())
+            bucket = self.buckets.setdefault(bucket_key, [])
+            for other in bucket:
+                if other in checked:
+                    continue
+                checked.add(other)
+                if self._find(other) == self._find(idx):
+                    continue
+                if estimate_similarity(signature, self.signatures[other]) >= self.threshold:
+                    self.parent[self._find(idx)] = self._find(other)
+            if len(bucket) < MAX_BUCKET_SIZE:
+                bucket.append(idx)
+
+    def clusters(self):
+        """返回重复组列表（每组为 [(key, title)]，按组大小降序）"""
+        groups = {}
+        for idx in range(len(self.keys)):
+            groups.setdefault(self._find(idx), []).append((self.keys[idx], self.titles[idx]))
+        return sorted((g for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0][0]))
+
+def write_duplicate_report(notes_dir, clusters):
+    """生成近似重复笔记报告，返回报告路径"""
+    changelog_dir = notes_dir / 'changelog'
+    changelog_dir.mkdir(exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_file = changelog_dir / f'重复笔记报告_{timestamp}.md'
+
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write("# 重复笔记报告\n\n")
+        f.write(f"**生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"**重复组数**: {len(clusters)} 组，"
+                f"共 {sum(len(group) for group in clusters)} 个文件\n")
+        f.write(f"**相似度阈值**: {DUPLICATE_THRESHOLD}\n\n")
+        f.write("---\n\n")
+
+        for number, group in enumerate(clusters, 1):
+            f.write(f"## 第 {number} 组（{len(group)} 个文件）\n\n")
+            f.write("| 文件名 | 标题 |\n")
+            f.write("|--------|------|\n")
+            for key, title in group:
+                f.write(f"| {key} | {title} |\n")
+            f.write("\n")
+
+    return report_file
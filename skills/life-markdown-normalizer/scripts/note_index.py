@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+笔记索引
+- 由 normalize_notes.py --index 维护：标签 → 笔记 的倒排索引 + 按创建时间排序的日期索引
+- 查询: python note_index.py [--dir PATH] [--tag TAG]... [--since YYYYMMDD] [--until YYYYMMDD] [--limit N]
+"""
+
+import json
+import os
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+INDEX_NAME = '.normalize_index.json'
+INDEX_VERSION = 1
+
+class NoteIndex:
+    """笔记元数据索引
+
+    notes: {相对路径: {title, date_created, date_modified, tags}}
+    tags / dates 在保存时由 notes 重建，查询时直接读取，无需扫描笔记。
+    """
+
+    def __init__(self, notes=None, tags=None, dates=None):
+        self.notes = notes or {}
+        self.tags = tags or {}
+        self.dates = dates or []
+
+    @classmethod
+    def load(cls, notes_dir):
+        """读取索引，不存在或版本不符时返回空索引"""
+        try:
+            with open(Path(notes_dir) / INDEX_NAME, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get('version') != INDEX_VERSION:
+            return cls()
+        return cls(data.get('notes'), data.get('tags'), data.get('dates'))
+
+    def update(self, key, metadata):
+        """添加或更新一篇笔记"""
+        self.notes[key] = {
+            'title': str(metadata.get('title', '')),
+            'date_created': str(metadata.get('date_created', '')),
+            'date_modified': str(metadata.get('date_modified', '')),
+            'tags': [str(tag) for tag in metadata.get('tags') or []],
+        }
+
+    def remove(self, key):
+        """移除一篇笔记"""
+        self.notes.pop(key, None)
+
+    def prune(self, keep_keys):
+        """移除不在 keep_keys 中的笔记（已删除的文件）"""
+        for key in [key for key in self.notes if key not in keep_keys]:
+            del self.notes[key]
+
+    def rebuild(self):
+        """由 notes 重建标签倒排索引和日期索引"""
+        tags = {}
+        for key, note in self.notes.items():
+            for tag in note['tags']:
+                tags.setdefault(tag, []).append(key)
+        self.tags = {tag: sorted(keys) for tag, keys in tags.items()}
+        self.dates = sorted([note['date_created'], key] for key, note in self.notes.items())
+
+    def save(self, notes_dir):
+        """重建后原子写入索引文件"""
+        self.rebuild()
+        index_path = Path(notes_dir) / INDEX_NAME
+        tmp_path = index_path.with_name(index_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'notes': self.notes,
+                'tags': self.tags,
+                'dates': self.dates,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, index_path)
+
+    def query(self, tags=(), since=None, until=None):
+        """按标签（全部命中）和创建时间范围查询，返回按创建时间排序的 [(key, note)]"""
+        # 日期范围：在有序日期索引上二分，时间戳补齐到14位
+        start = 0
+        end = len(self.dates)
+        if since:
+            start = bisect_left(self.dates, [since.ljust(14, '0'), ''])
+        if until:
+            end = bisect_right(self.dates, [until.ljust(14, '9'), '\uffff'])
+        keys = [key for _, key in self.dates[start:end]]
+
+        # 标签：从最短的倒排列表开始求交集
+        if tags:
+            postings = sorted((set(self.tags.get(tag, [])) for tag in tags), key=len)
+            matched = set.intersection(*postings)
+            keys = [key for key in keys if key in matched]
+
+        return [(key, self.notes[key]) for key in keys]
+
+def main():
+    """主函数"""
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("用法: python note_index.py [--dir PATH] [--tag TAG]... [--since YYYYMMDD] [--until YYYYMMDD] [--limit N]")
+        print("  --dir PATH: 笔记目录（默认为当前目录）")
+        print("  --tag TAG: 按标签过滤，可重复（需同时包含全部标签）")
+        print("  --since / --until: 按创建时间过滤（YYYYMMDD[HHmmss]）")
+        print("  --limit N: 最多显示N条")
+        print(f"索引文件 {INDEX_NAME} 由 normalize_notes.py --execute --index 生成")
+        sys.exit(0)
+
+    notes_dir = Path.cwd()
+    tags = []
+    since = None
+    until = None
+    limit = None
+
+    for idx, arg in enumerate(sys.argv[:-1]):
+        value = sys.argv[idx + 1]
+        if arg == '--dir':
+            notes_dir = Path(value)
+        elif arg == '--tag':
+            tags.append(value)
+        elif arg == '--since':
+            since = value
+        elif arg == '--until':
+            until = value
+        elif arg == '--limit':
+            limit = int(value)
+
+    if not (notes_dir / INDEX_NAME).exists():
+        print(f"❌ 未找到索引文件: {notes_dir / INDEX_NAME}")
+        print("   请先运行: python normalize_notes.py --execute --index")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    index = NoteIndex.load(notes_dir)
+    results = index.query(tags, since, until)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for key, note in results[:limit] if limit else results:
+        print(f"{note['date_created']}  {key}  {note['title']}  {note['tags']}")
+
+    print(f"\n共 {len(results)} 篇笔记（索引 {len(index.notes)} 篇，耗时 {elapsed_ms:.1f} ms）")
+
+if __name__ == "__main__":
+    main()
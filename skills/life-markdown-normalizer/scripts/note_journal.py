@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+执行模式的预写日志
+- 每个文件的写入/重命名在执行前先追加到日志（JSON Lines），按批 fsync
+- 运行中断后用 normalize_notes.py --resume 补完或回退未完成的操作
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+JOURNAL_NAME = '.normalize_journal.jsonl'
+
+# 每批计划的文件数：整批写入日志后只 fsync 一次
+JOURNAL_SYNC_EVERY = 64
+
+def temp_path_for(filepath):
+    """原子写入使用的临时文件路径（与 write_file_atomic 一致）"""
+    return filepath.with_name(f".{filepath.name}.tmp")
+
+def _file_hash(filepath):
+    """按文本读取文件并计算 SHA-256（与 content_hash 一致）"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return hashlib.sha256(f.read().encode('utf-8')).hexdigest()
+
+class RunJournal:
+    """追加写入的运行日志
+
+    记录格式：
+    - {"op": "begin", "time": ...}
+    - {"op": "plan", "seq": n, "path": 原路径, "sha256": 新内容哈希或 null,
+       "rename_to": 新路径或 null, "title": ..., "date": ...}
+    - {"op": "done", "seq": n}
+    - {"op": "end"}
+    路径均相对笔记目录。运行正常结束后日志被删除。
+    """
+
+    def __init__(self, notes_dir):
+        self.notes_dir = Path(notes_dir)
+        self.path = self.notes_dir / JOURNAL_NAME
+        self.file = None
+        self.seq = 0
+
+    @staticmethod
+    def exists(notes_dir):
+        """是否存在未完成运行留下的日志"""
+        return (Path(notes_dir) / JOURNAL_NAME).exists()
+
+    def open(self):
+        """开始新的运行"""
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self._append({'op': 'begin', 'time': datetime.now().strftime('%Y%m%d%H%M%S')})
+        self.sync()
+
+    def _append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def plan(self, path, sha256, rename_to, title, date):
+        """追加一条计划操作，返回序号（调用 sync 后才保证落盘）"""
+        self.seq += 1
+        self._append({
+            'op': 'plan', 'seq': self.seq, 'path': path, 'sha256': sha256,
+            'rename_to': rename_to, 'title': title, 'date': date,
+        })
+        return self.seq
+
+    def done(self, seq):
+        """标记操作完成（随下一次 sync 落盘即可）"""
+        self._append({'op': 'done', 'seq': seq})
+
+    def sync(self):
+        """把已追加的记录写入磁盘"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def finish(self):
+        """运行正常结束：关闭并删除日志"""
+        self._append({'op': 'end'})
+        self.file.close()
+        self.file = None
+        self.path.unlink()
+
+def read_journal(notes_dir):
+    """读取日志，返回 (计划记录列表, 已完成序号集合)；忽略崩溃时写了一半的末行"""
+    plans = []
+    done = set()
+    with open(Path(notes_dir) / JOURNAL_NAME, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('op') == 'plan':
+                plans.append(record)
+            elif record.get('op') == 'done':
+                done.add(record['seq'])
+    return plans, done
+
+def recover(notes_dir):
+    """处理中断运行留下的日志
+
+    对每条未标记完成的计划：
+    - 临时文件完整（哈希一致）：补完替换，再补完重命名
+    - 临时文件不完整：删除临时文件并放弃该文件的重命名，原文件保持不变
+    - 写入已完成（原文件哈希一致）或无需写入：补完重命名
+    - 尚未开始：放弃，下次执行时重新处理
+    返回 (统计, 重命名记录)；重命名记录只包含确实发生的重命名（本次补完的，以及
+    中断前已完成的），用于补写变更清单；冲突或回退的计划不计入。
+    完成后删除日志。
+    """
+    notes_dir = Path(notes_dir)
+    plans, done = read_journal(notes_dir)
+    stats = {'replayed': 0, 'rolled_back': 0, 'conflicts': 0}
+    rename_log = []
+
+    for plan in plans:
+        src = notes_dir / plan['path']
+        dst = notes_dir / plan['rename_to'] if plan['rename_to'] else None
+        renamed = False
+
+        if plan['seq'] not in done and src.exists():
+            written = not plan['sha256']
+            if plan['sha256']:
+                tmp = temp_path_for(src)
+                if tmp.exists() and _file_hash(tmp) == plan['sha256']:
+                    os.replace(tmp, src)
+                    written = True
+                elif tmp.exists():
+                    tmp.unlink()
+                else:
+                    written = _file_hash(src) == plan['sha256']
+
+            if not written:
+                stats['rolled_back'] += 1
+            elif dst is not None and dst.exists():
+                stats['conflicts'] += 1
+            else:
+                if dst is not None:
+                    src.rename(dst)
+                    renamed = True
+                stats['replayed'] += 1
+        elif dst is not None:
+            # 中断前已完成的重命名：原文件已不在、目标文件存在
+            renamed = dst.exists() and not src.exists()
+
+        if renamed:
+            rename_log.append({
+                'old_name': plan['path'],
+                'new_name': plan['rename_to'],
+                'title': plan['title'],
+                'date': plan['date'],
+            })
+
+    (notes_dir / JOURNAL_NAME).unlink()
+    return stats, rename_log
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+笔记目录监听
+
+Linux 下通过 ctypes 调用 inotify，只在笔记写入完成（IN_CLOSE_WRITE）或移入
+（IN_MOVED_TO）时产生事件，不需要周期性全量扫描；其他平台或 inotify 不可用时
+退回到按间隔比较 (size, mtime) 快照的轮询方式。
+
+变更经过防抖后成批交给回调：最后一次事件后静默 DEBOUNCE_SECONDS 秒，
+或距本批第一个事件已超过 MAX_BATCH_DELAY 秒时触发一次处理。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+DEBOUNCE_SECONDS = 1.0
+MAX_BATCH_DELAY = 10.0
+POLL_INTERVAL = 2.0
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+
+def _load_libc():
+    """加载提供 inotify 的 libc，不可用时返回 None"""
+    if not hasattr(os, 'O_CLOEXEC'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class InotifyWatcher:
+    """基于 inotify 的监听器；recursive 时为每个子目录添加监听（新建目录也会补上）"""
+
+    FILE_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, libc, root, recursive=False, accept_dir=None):
+        self.libc = libc
+        self.root = Path(root)
+        self.recursive = recursive
+        self.accept_dir = accept_dir or (lambda path: True)
+        self.watches = {}  # wd -> 目录
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self._add_tree(self.root)
+
+    def _add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.FILE_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'无法监听 {directory}: {os.strerror(errno)}')
+        self.watches[wd] = directory
+
+    def _add_tree(self, directory):
+        """监听目录（递归时包括未排除的子目录），返回其中已存在的笔记"""
+        found = []
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            self._add_watch(current)
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                path = current / entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive and self.accept_dir(path):
+                        stack.append(path)
+                elif entry.name.endswith('.md'):
+                    found.append(path)
+        return found
+
+    def read_changes(self, timeout):
+        """等待最多 timeout 秒，返回变更的笔记路径集合；事件队列溢出时返回 None"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changes = set()
+        while True:
+            try:
+                data = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / name
+                if mask & IN_ISDIR:
+                    # 新建或移入的子目录：补加监听，并把监听生效前已写入的笔记算作变更
+                    if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and self.accept_dir(path):
+                        try:
+                            changes.update(self._add_tree(path))
+                        except OSError:
+                            pass
+                    continue
+                # IN_CREATE 只用于发现目录；文件等写入完成（IN_CLOSE_WRITE）或移入后再处理
+                if mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and name.endswith('.md'):
+                    changes.add(path)
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """轮询监听器：按间隔对 scan() 的结果做 (size, mtime) 快照并比较"""
+
+    def __init__(self, scan, interval=POLL_INTERVAL):
+        self.scan = scan
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+        self.next_poll = time.monotonic() + interval
+
+    def _take_snapshot(self):
+        return {path: (stat.st_size, stat.st_mtime_ns) for path, stat in self.scan()}
+
+    def read_changes(self, timeout):
+        delay = self.next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_poll = time.monotonic() + self.interval
+
+        snapshot = self._take_snapshot()
+        changes = {path for path, state in snapshot.items() if self.snapshot.get(path) != state}
+        self.snapshot = snapshot
+        return changes
+
+    def close(self):
+        pass
+
+def create_watcher(root, recursive, accept_dir, scan, polling=False):
+    """优先使用 inotify，不可用（非 Linux、监听数达到上限等）时退回轮询"""
+    if not polling:
+        libc = _load_libc()
+        if libc is not None:
+            try:
+                return InotifyWatcher(libc, root, recursive, accept_dir)
+            except OSError as e:
+                print(f"⚠️  inotify 不可用（{e}），改用轮询")
+    return PollingWatcher(scan)
+
+def watch(watcher, on_batch, debounce=DEBOUNCE_SECONDS, max_delay=MAX_BATCH_DELAY):
+    """持续读取变更，防抖后以排序后的路径列表调用 on_batch
+
+    事件队列溢出时调用 on_batch(None)，由调用方做一次完整扫描。
+    """
+    pending = set()
+    first_event = last_event = None
+    while True:
+        changes = watcher.read_changes(min(debounce, 0.5))
+        now = time.monotonic()
+        if changes is None:
+            pending.clear()
+            first_event = last_event = None
+            on_batch(None)
+            continue
+        if changes:
+            pending |= changes
+            last_event = now
+            if first_event is None:
+                first_event = now
+        if pending and (now - last_event >= debounce or now - first_event >= max_delay):
+            batch = sorted(pending, key=lambda path: (path.parent, path.name))
+            pending.clear()
+            first_event = last_event = None
+            on_batch(batch)
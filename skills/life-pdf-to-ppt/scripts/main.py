@@ -3,9 +3,10 @@
 PDF Chart to Editable PPT Converter
 将 PDF 图表通过 AI 矢量化转换为可编辑的 PowerPoint 演示文稿
 """
+import asyncio
 import os
 import time
-from src.batch_processor import process_single_pdf
+from src.batch_processor import process_pdfs
 from src.config import MAX_WORKERS, MODEL_NAME
 
 
@@ -32,28 +33,23 @@ def main():
     print(f"📂 输入目录: {INPUT_DIR}/")
     print(f"📂 输出目录: {OUTPUT_DIR}/")
     print(f"📊 待处理文件: {len(pdf_files)} 个 PDF")
-    print(f"⚙️  并发线程数: {MAX_WORKERS}")
+    print(f"⚙️  在途请求上限: {MAX_WORKERS}")
     print(f"🤖 AI 模型: {MODEL_NAME}")
     print("=" * 60)
 
     total_start = time.time()
-    success_count = 0
-    fail_count = 0
 
-    # 逐个处理 PDF
-    for idx, pdf_file in enumerate(pdf_files, 1):
-        pdf_path = os.path.join(INPUT_DIR, pdf_file)
-
-        print(f"\n[{idx}/{len(pdf_files)}] 开始处理...")
+    # 所有 PDF 的页面进入同一个队列，每个 PDF 的页面全部完成后立即组装 PPT
+    pdf_paths = [os.path.join(INPUT_DIR, pdf_file) for pdf_file in pdf_files]
+    try:
+        results = asyncio.run(process_pdfs(pdf_paths, OUTPUT_DIR))
+    except KeyboardInterrupt:
+        print("\n⏹️  已中断")
+        return
 
-        try:
-            if process_single_pdf(pdf_path, OUTPUT_DIR):
-                success_count += 1
-            else:
-                fail_count += 1
-        except Exception as e:
-            print(f"❌ 处理 {pdf_file} 时发生异常: {e}")
-            fail_count += 1
+    success_count = sum(1 for ok in results if ok)
+    fail_count = len(results) - success_count
+    failed = [pdf_file for pdf_file, ok in zip(pdf_files, results) if not ok]
 
     # 最终汇总报告
     total_duration = time.time() - total_start
@@ -62,6 +58,8 @@ def main():
     print("=" * 60)
     print(f"✅ 成功转换: {success_count} 个")
     print(f"❌ 失败: {fail_count} 个")
+    for pdf_file in failed:
+        print(f"   - {pdf_file}")
     print(f"⏱️  总耗时: {total_duration:.2f} 秒 ({total_duration/60:.1f} 分钟)")
     print(f"📁 输出目录: {OUTPUT_DIR}/")
     print("=" * 60)
@@ -1,65 +1,243 @@
-"""AI 矢量化模块"""
+"""AI 矢量化模块
+
+基于 asyncio + AsyncOpenAI：所有页面共享一个客户端和一个限流器，在途请求数由
+MAX_WORKERS 控制，不再占用线程。限流使用两个令牌桶（每分钟请求数、每分钟
+token 数），重试采用带抖动的指数退避，并优先遵守服务端返回的 Retry-After。
+"""
+import asyncio
 import base64
+import random
 import time
-from openai import OpenAI
-from .config import API_KEY, MODEL_NAME
-
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-# 初始化 OpenRouter 客户端
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=API_KEY,
+from openai import APIStatusError, AsyncOpenAI
+from .config import (
+    API_KEY,
+    BASE_URL,
+    MAX_RETRIES,
+    MAX_WORKERS,
+    MODEL_NAME,
+    REQUESTS_PER_MINUTE,
+    TOKENS_PER_MINUTE,
+    TOKENS_PER_PAGE,
 )
 
+PROMPT = "转换成SVG，要求一模一样，不用解释，直接输出SVG代码。使用 <text> 标签来渲染文字，字体请使用通用的 sans-serif。不要包含 markdown 标记（如 ```xml），只返回纯代码。"
 
-def convert_image_to_svg(image_path, page_num, max_retries=3):
-    """步骤 2: 调用 AI 将图片重绘为 SVG"""
-    print(f"🤖 [2/5] 正在 AI 矢量化处理第 {page_num} 页 (Model: {MODEL_NAME})...")
+# 退避参数：第 n 次失败后等待 [base/2, base] 秒，base = min(BACKOFF_CAP, 2^n)
+BACKOFF_CAP = 60.0
 
-    with open(image_path, "rb") as image_file:
-        base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+# 这些状态码之外的 4xx（鉴权失败、参数错误等）重试也不会成功
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class TokenBucket:
+    """令牌桶：每分钟补充 per_minute 个令牌，最多积累一分钟的额度"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """距离桶内有 amount 个令牌还需等待的秒数（超过容量的请求按满桶放行）"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        """扣除令牌；结算时实际用量大于预估，余额可以为负，后续请求相应推迟"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """请求数 + token 数双令牌桶；收到 429 后所有请求一起暂停"""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
 
-    prompt = "转换成SVG，要求一模一样，不用解释，直接输出SVG代码。使用 <text> 标签来渲染文字，字体请使用通用的 sans-serif。不要包含 markdown 标记（如 ```xml），只返回纯代码。"
+    async def acquire(self, estimated_tokens):
+        """等待直到可以发送一个预估消耗 estimated_tokens 的请求
 
-    for attempt in range(1, max_retries + 1):
+        等待时持有锁，排队的请求按到达顺序放行，不会被后来者插队。
+        """
+        async with self._lock:
+            while True:
+                delay = self.blocked_until - time.monotonic()
+                if self.requests:
+                    delay = max(delay, self.requests.wait_time(1))
+                if self.tokens:
+                    delay = max(delay, self.tokens.wait_time(estimated_tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(estimated_tokens)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """按响应中的实际 token 用量修正预估值"""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.take(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def retry_after_seconds(error):
+    """从错误响应的 Retry-After / retry-after-ms 头读取等待秒数，没有时返回 None"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    value = headers.get("retry-after-ms")
+    if value:
         try:
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
-                                },
-                            },
-                        ],
-                    }
-                ],
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # HTTP 日期格式
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt):
+    """带抖动的指数退避，避免多个页面在同一时刻集中重试"""
+    base = min(BACKOFF_CAP, 2.0**attempt)
+    return base / 2 + random.uniform(0, base / 2)
+
+
+def is_retryable(error):
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    # 连接失败、超时、AI 返回内容为空
+    return True
+
+
+def encode_image(image_path):
+    with open(image_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+def build_messages(base64_image):
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": PROMPT},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/png;base64,{base64_image}"},
+                },
+            ],
+        }
+    ]
+
+
+class AsyncVectorizer:
+    """异步矢量化引擎：共享客户端、限流器和在途请求上限
+
+    客户端自带的重试被关闭（max_retries=0），重试统一由 convert 处理，
+    这样每次重发都会经过限流器。
+    """
+
+    def __init__(self, concurrency=MAX_WORKERS, limiter=None, max_retries=MAX_RETRIES):
+        self.client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY, max_retries=0)
+        self.limiter = limiter or RateLimiter()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.close()
+
+    async def request(self, messages):
+        """发送一次请求（占用一个在途名额），返回 SVG 文本"""
+        async with self.semaphore:
+            await self.limiter.acquire(TOKENS_PER_PAGE)
+            response = await self.client.chat.completions.create(
+                model=MODEL_NAME, messages=messages
             )
 
-            # 检查返回内容是否有效
-            if response and response.choices and len(response.choices) > 0:
-                content = response.choices[0].message.content
-                if content:
-                    return content
+        usage = getattr(response, "usage", None)
+        self.limiter.settle(TOKENS_PER_PAGE, usage.total_tokens if usage else None)
+
+        # 检查返回内容是否有效
+        if response and response.choices and len(response.choices) > 0:
+            content = response.choices[0].message.content
+            if content:
+                return content
+            raise ValueError("AI 返回内容为空")
+        raise ValueError("AI 响应格式无效")
+
+    async def convert(self, image_path, page_num, label=None):
+        """步骤 2: 调用 AI 将图片重绘为 SVG，失败返回 None
+
+        退避等待期间不占用在途名额，其他页面可以继续发送。
+        """
+        label = label or f"第 {page_num} 页"
+        base64_image = await asyncio.to_thread(encode_image, image_path)
+        messages = build_messages(base64_image)
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return await self.request(messages)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    print(f"    ❌ {label}处理失败 (尝试 {attempt}/{self.max_retries}): {e}")
+                    return None
+
+                retry_after = retry_after_seconds(e)
+                if retry_after is not None:
+                    # 服务端指定的等待时间，加少量抖动错开重发
+                    delay = retry_after + random.uniform(0, 1)
                 else:
-                    raise ValueError("AI 返回内容为空")
-            else:
-                raise ValueError("AI 响应格式无效")
-
-        except Exception as e:
-            if attempt < max_retries:
-                print(
-                    f"    ⚠️ 第 {page_num} 页处理失败 (尝试 {attempt}/{max_retries}): {e}"
-                )
-                print(f"    🔄 {2 ** attempt} 秒后重试...")
-                time.sleep(2**attempt)  # 指数退避：2秒、4秒、8秒
-            else:
-                print(f"    ❌ 第 {page_num} 页处理失败 (已重试 {max_retries} 次): {e}")
-                return None
-
-    return None
+                    delay = backoff_delay(attempt)
+                if isinstance(e, APIStatusError) and e.status_code == 429:
+                    self.limiter.pause(delay)
+
+                print(f"    ⚠️ {label}处理失败 (尝试 {attempt}/{self.max_retries}): {e}")
+                print(f"    🔄 {delay:.1f} 秒后重试...")
+                await asyncio.sleep(delay)
+
+        return None
+
+
+def convert_image_to_svg(image_path, page_num, max_retries=MAX_RETRIES):
+    """同步接口：单独转换一页（批量处理请使用 AsyncVectorizer）"""
+
+    async def run():
+        async with AsyncVectorizer(max_retries=max_retries) as engine:
+            return await engine.convert(image_path, page_num)
+
+    return asyncio.run(run())
@@ -1,89 +1,79 @@
-"""批处理协调模块"""
+"""批处理协调模块
+
+所有 PDF 的页面进入同一个工作队列：渲染线程逐个把 PDF 转成图片并入队，
+一组异步 worker 从队列取页面交给 AI 矢量化，因此即使每个 PDF 只有一两页，
+AI 阶段也能保持满载。某个 PDF 的页面全部完成后，在单独的组装线程中按页码
+顺序完成 SVG -> EMF -> PPT，不阻塞其他页面的矢量化。
+"""
+import asyncio
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 from .pdf_processor import pdf_to_images
-from .ai_vectorizer import convert_image_to_svg
+from .ai_vectorizer import AsyncVectorizer
 from .svg_processor import clean_and_save_svg, convert_svg_to_emf
 from .ppt_generator import generate_ppt
 from .config import MAX_WORKERS
 
 
-def process_single_page(img_path, page_num, svg_folder):
+class PdfJob:
+    """单个 PDF 的处理状态：页面结果按页码存放，剩余页数归零后组装 PPT"""
+
+    def __init__(self, pdf_path, output_dir):
+        self.pdf_path = pdf_path
+        self.pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+
+        # 创建临时文件夹结构：temp/{pdf_name}/
+        temp_base = os.path.join("temp", self.pdf_name)
+        self.temp_images = os.path.join(temp_base, "images")
+        self.temp_svgs = os.path.join(temp_base, "svgs")
+        self.temp_emf = os.path.join(temp_base, "emf")
+
+        # 输出 PPT 路径
+        self.output_ppt = os.path.join(output_dir, f"{self.pdf_name}_Editable.pptx")
+
+        self.image_paths = []
+        self.svg_file_paths = []
+        self.remaining = 0
+        self.start_time = None
+
+
+async def process_single_page(engine, job, img_path, page_num):
     """并发处理单个页面：图片 -> AI -> SVG"""
+    label = f"{job.pdf_name} 第 {page_num} 页"
     try:
         # 调用 AI
-        raw_svg = convert_image_to_svg(img_path, page_num)
+        raw_svg = await engine.convert(img_path, page_num, label=label)
 
         if raw_svg:
             # 保存 SVG
-            svg_path = clean_and_save_svg(raw_svg, page_num, svg_folder)
-            return (page_num, svg_path)
+            return clean_and_save_svg(raw_svg, page_num, job.temp_svgs)
         else:
-            print(f"    ⚠️ 跳过第 {page_num} 页 (AI 返回为空)")
-            return (page_num, None)
+            print(f"    ⚠️ 跳过{label} (AI 返回为空)")
+            return None
     except Exception as e:
-        print(f"    ❌ 第 {page_num} 页处理异常: {e}")
-        return (page_num, None)
-
+        print(f"    ❌ {label}处理异常: {e}")
+        return None
 
-def process_single_pdf(pdf_path, output_dir):
-    """处理单个 PDF 文件的完整流程"""
-    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-
-    # 创建临时文件夹结构：temp/{pdf_name}/
-    temp_base = os.path.join("temp", pdf_name)
-    temp_images = os.path.join(temp_base, "images")
-    temp_svgs = os.path.join(temp_base, "svgs")
-    temp_emf = os.path.join(temp_base, "emf")
-
-    # 输出 PPT 路径
-    output_ppt = os.path.join(output_dir, f"{pdf_name}_Editable.pptx")
 
+def assemble_pdf(job):
+    """页面全部完成后：SVG -> EMF -> PPT（在组装线程中执行）"""
+    total = len(job.image_paths)
     print(f"\n{'=' * 60}")
-    print(f"📄 正在处理: {os.path.basename(pdf_path)}")
+    print(f"📦 正在组装: {os.path.basename(job.pdf_path)}")
     print(f"{'=' * 60}")
-
-    start_time = time.time()
-
-    # 1. PDF 转图片
-    image_paths = pdf_to_images(pdf_path, temp_images)
-
-    svg_file_paths = [None] * len(image_paths)  # 初始化结果列表
-    emf_file_paths = []
-
-    # 2. 并发处理：图片 -> AI -> SVG
-    print(f"\n🤖 [2/5] 正在 AI 矢量化处理 (并发数: {MAX_WORKERS})...")
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # 提交所有任务
-        futures = {
-            executor.submit(process_single_page, img_path, i + 1, temp_svgs): i
-            for i, img_path in enumerate(image_paths)
-        }
-
-        # 收集完成的结果
-        completed = 0
-        total = len(image_paths)
-
-        for future in as_completed(futures):
-            page_num, svg_path = future.result()
-            svg_file_paths[page_num - 1] = svg_path  # 保持页面顺序
-
-            completed += 1
-            print(f"    -> 进度: {completed}/{total} 页完成")
-
     print(
-        f"    ✅ AI 矢量化处理完成！成功: {sum(1 for x in svg_file_paths if x)} / {total}"
+        f"    ✅ AI 矢量化处理完成！成功: {sum(1 for x in job.svg_file_paths if x)} / {total}"
     )
 
     # 3. SVG 转 EMF
+    emf_file_paths = []
     print(f"\n🔄 [3/5] 正在将 SVG 转换为 EMF (使用 Inkscape)...")
-    for i, svg_path in enumerate(svg_file_paths):
+    for i, svg_path in enumerate(job.svg_file_paths):
         page_num = i + 1
         if svg_path:
-            emf_path = convert_svg_to_emf(svg_path, temp_emf)
+            emf_path = convert_svg_to_emf(svg_path, job.temp_emf)
             if emf_path:
                 print(f"    -> ✅ 第 {page_num} 页 EMF 已生成")
                 emf_file_paths.append(emf_path)
@@ -95,17 +85,96 @@ def process_single_pdf(pdf_path, output_dir):
 
     # 4. 生成 PPT
     if any(emf_file_paths):
-        count = generate_ppt(emf_file_paths, output_ppt)
+        count = generate_ppt(emf_file_paths, job.output_ppt)
 
-        # 5. 输出报告
-        duration = time.time() - start_time
+        # 5. 输出报告（耗时从开始渲染该 PDF 算起，包含在队列中等待的时间）
+        duration = time.time() - job.start_time
         print(f"\n✅ [5/5] 处理完成！")
         print(f"   - 总耗时: {duration:.2f} 秒 ({duration/60:.1f} 分钟)")
-        print(f"   - 输入页数: {len(image_paths)}")
+        print(f"   - 输入页数: {total}")
         print(f"   - 成功转换: {count}")
-        print(f"   - 输出文件: {output_ppt}")
+        print(f"   - 输出文件: {job.output_ppt}")
 
         return True
     else:
-        print(f"❌ 未生成任何有效的 EMF，{pdf_name} 处理失败。")
+        print(f"❌ 未生成任何有效的 EMF，{job.pdf_name} 处理失败。")
+        return False
+
+
+def safe_assemble_pdf(job):
+    try:
+        return assemble_pdf(job)
+    except Exception as e:
+        print(f"❌ 组装 {os.path.basename(job.pdf_path)} 时发生异常: {e}")
         return False
+
+
+async def process_pdfs(pdf_paths, output_dir):
+    """用一个跨 PDF 的页面队列处理所有 PDF，按输入顺序返回每个 PDF 是否成功"""
+    loop = asyncio.get_running_loop()
+    jobs = [PdfJob(pdf_path, output_dir) for pdf_path in pdf_paths]
+    results = [False] * len(jobs)
+    assembled = []  # 组装任务的 future
+
+    # 有界队列：渲染最多领先 AI 阶段几批页面
+    queue = asyncio.Queue(maxsize=MAX_WORKERS * 2)
+    # worker 数多于在途上限：部分页面在退避等待时，其余 worker 仍能把请求名额用满
+    worker_count = MAX_WORKERS * 2
+
+    # 单线程组装：Inkscape 较重，且各 PDF 的组装日志不会交错
+    with ThreadPoolExecutor(max_workers=1) as assembler:
+
+        def finish(index):
+            assembled.append((index, loop.run_in_executor(assembler, safe_assemble_pdf, jobs[index])))
+
+        async def produce():
+            for index, job in enumerate(jobs):
+                print(f"\n[{index + 1}/{len(jobs)}] 📄 正在渲染: {os.path.basename(job.pdf_path)}")
+                job.start_time = time.time()
+                try:
+                    # 1. PDF 转图片（在线程中执行，渲染期间 AI 阶段继续处理已入队的页面）
+                    job.image_paths = await asyncio.to_thread(pdf_to_images, job.pdf_path, job.temp_images)
+                except Exception as e:
+                    print(f"❌ 处理 {os.path.basename(job.pdf_path)} 时发生异常: {e}")
+                    continue
+
+                job.svg_file_paths = [None] * len(job.image_paths)  # 初始化结果列表
+                job.remaining = len(job.image_paths)
+                if not job.remaining:
+                    finish(index)
+                    continue
+                for i, img_path in enumerate(job.image_paths):
+                    await queue.put((index, img_path, i + 1))
+
+            for _ in range(worker_count):
+                await queue.put(None)
+
+        async def work(engine):
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                index, img_path, page_num = item
+                job = jobs[index]
+
+                # 2. 图片 -> AI -> SVG
+                job.svg_file_paths[page_num - 1] = await process_single_page(engine, job, img_path, page_num)  # 保持页面顺序
+                job.remaining -= 1
+                total = len(job.image_paths)
+                print(f"    -> {job.pdf_name} 进度: {total - job.remaining}/{total} 页完成")
+                if job.remaining == 0:
+                    finish(index)
+
+        print(f"\n🤖 [2/5] AI 矢量化队列已启动 (在途请求上限: {MAX_WORKERS})...")
+        async with AsyncVectorizer() as engine:
+            await asyncio.gather(produce(), *(work(engine) for _ in range(worker_count)))
+
+        for index, future in assembled:
+            results[index] = await future
+
+    return results
+
+
+def process_single_pdf(pdf_path, output_dir):
+    """处理单个 PDF 文件的完整流程"""
+    return asyncio.run(process_pdfs([pdf_path], output_dir))[0]
@@ -8,7 +8,14 @@ load_dotenv()
 # API 配置
 API_KEY = os.getenv("OPENROUTER_API_KEY")
 MODEL_NAME = os.getenv("MODEL_NAME", "google/gemini-3-pro-preview")
-MAX_WORKERS = int(os.getenv("MAX_WORKERS", "3"))
+BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "16"))  # 同时在途的 AI 请求数
+
+# 限流与重试配置（0 表示不限制）
+REQUESTS_PER_MINUTE = int(os.getenv("REQUESTS_PER_MINUTE", "60"))
+TOKENS_PER_MINUTE = int(os.getenv("TOKENS_PER_MINUTE", "0"))
+TOKENS_PER_PAGE = int(os.getenv("TOKENS_PER_PAGE", "4000"))  # 发送前预估的单页 token 数
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))
 
 # 验证 API Key
 if not API_KEY:
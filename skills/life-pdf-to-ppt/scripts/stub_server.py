@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+本地 OpenAI 兼容桩服务器
+用于在不调用真实 API 的情况下测试矢量化引擎的并发、限流和重试：
+
+    python stub_server.py --port 8765 --latency 2 --rate-limit-every 5
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/v1 OPENROUTER_API_KEY=stub python main.py
+
+每个 /chat/completions 请求等待 latency 秒后返回一段固定 SVG；
+--rate-limit-every N 使每第 N 个请求返回 429 和 Retry-After。
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="1280" height="720"><text x="40" y="80" font-family="sans-serif">stub</text></svg>'
+
+
+class StubState:
+    """请求计数与并发统计（多个处理线程共享）"""
+
+    def __init__(self, latency, rate_limit_every, retry_after):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = time.monotonic()
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            limited = self.rate_limit_every > 0 and self.requests % self.rate_limit_every == 0
+            if limited:
+                self.rate_limited += 1
+            return self.requests, limited
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        return (f"请求 {self.requests} 次 (429: {self.rate_limited})，"
+                f"最大并发 {self.max_in_flight}，运行 {elapsed:.1f} 秒")
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.endswith("/chat/completions"):
+                self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+
+            number, limited = state.enter()
+            try:
+                if limited:
+                    self.send_json(429, {"error": {"message": "rate limited (stub)"}},
+                                   {"Retry-After": str(state.retry_after)})
+                    return
+                time.sleep(state.latency)
+                request = json.loads(body or b"{}")
+                self.send_json(200, {
+                    "id": f"stub-{number}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": STUB_SVG},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": len(body) // 4,
+                        "completion_tokens": len(STUB_SVG) // 4,
+                        "total_tokens": len(body) // 4 + len(STUB_SVG) // 4,
+                    },
+                })
+            finally:
+                state.leave()
+
+        def send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            print(f"    [stub] {self.command} {self.path} -> {args[1]}  ({state.summary()})")
+
+    return Handler
+
+
+def _get_option(name, default, cast):
+    """读取选项后面的值"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return cast(sys.argv[idx + 1])
+    return default
+
+
+def main():
+    if "--help" in sys.argv or "-h" in sys.argv:
+        print("用法: python stub_server.py [--port N] [--latency 秒] [--rate-limit-every N] [--retry-after 秒]")
+        print("  --port N: 监听端口（默认 8765）")
+        print("  --latency 秒: 每个请求的模拟耗时（默认 1.0）")
+        print("  --rate-limit-every N: 每第 N 个请求返回 429（默认 0，不限流）")
+        print("  --retry-after 秒: 429 响应的 Retry-After（默认 2）")
+        sys.exit(0)
+
+    port = _get_option("--port", 8765, int)
+    state = StubState(
+        latency=_get_option("--latency", 1.0, float),
+        rate_limit_every=_get_option("--rate-limit-every", 0, int),
+        retry_after=_get_option("--retry-after", 2, int),
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    print(f"🧪 桩服务器已启动: http://127.0.0.1:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {state.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,259 @@
 #!/usr/bin/env python3
+import cProfile
+import hashlib
 import json
+import os
+import pstats
 import re
-from datetime import timedelta
+import sys
+import time
+import traceback
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate, repeat
 from pathlib import Path
 
-class BatchSlicer:
-    def __init__(self):
+from slice_index import INDEX_NAME, SliceIndex, collect_slice_terms, lexical_terms
+from subtitle_formats import SUBTITLE_EXTENSIONS, iter_file_segments
+
+# Content-aware boundaries: a cut scores high after a long pause and where the
+# vocabulary of the cues before it differs from the cues after it (TextTiling-style)
+LEXICAL_WINDOW = 10       # cues compared on each side of a candidate cut
+LONG_PAUSE_SECONDS = 3.0  # pauses this long get the full pause score
+PAUSE_WEIGHT = 0.5        # share of the pause score in the combined score
+MIN_SLICE_RATIO = 0.5     # slices stay within [0.5, 1.5] x target length
+MAX_SLICE_RATIO = 1.5
+
+OUTPUT_DIR = Path("slices_output_final")
+# Records which source (by content hash + slicer parameters) produced which output
+MANIFEST_NAME = '.slices_manifest.json'
+# Bump when slicing output changes so cached results are regenerated
+CACHE_VERSION = 2
+
+# NDJSON output: one compact line per slice, appended to one file per output directory
+OUTPUT_FORMATS = ('json', 'ndjson', 'both')
+NDJSON_NAME = 'slices.ndjson'
+NDJSON_BUFFER_SIZE = 1 << 20
+# Record schema in field order; only ever append new fields
+NDJSON_FIELDS = (
+    'source_file', 'cache_key', 'video_title', 'total_duration_seconds', 'slice_count',
+    'slice_id', 'slice_name', 'start_time_seconds', 'end_time_seconds', 'duration_seconds',
+    'start_time_formatted', 'end_time_formatted', 'knowledge_type', 'key_keywords', 'brief_intro',
+)
+
+# Keyword rules: a slice gets every label whose trigger words appear in its text, in table order
+KEYWORD_RULES = [
+    ('计算方法', ('计算', '公式', '算法', '求解')),
+    ('基本概念', ('概念', '定义', '含义')),
+    ('案例分析', ('案例', '例题', '应用')),
+    ('知识点总结', ('总结', '回顾', '要点')),
+    ('背景导入', ('背景', '导入', '导学')),
+]
+# Knowledge type: the first matching rule wins; otherwise it follows the slice position
+KNOWLEDGE_TYPE_RULES = [
+    ('计算方法', ('计算', '公式', '算法')),
+    ('案例分析', ('案例', '例题', '应用')),
+]
+
+def _overlaps(a, b):
+    """Whether a match of a can cover part of an occurrence of b"""
+    if b in a:
+        return True
+    return any(a[-k:] == b[:k] or b[-k:] == a[:k] for k in range(1, min(len(a), len(b))))
+
+class RuleMatcher:
+    """Trigger words of several rule tables evaluated together in one pass over the words
+
+    Each distinct word is tested once, and only while a rule it triggers is still
+    unmatched; the pass stops once all rules have matched. Short word lists use
+    plain substring tests, which beat a regex scan here. Larger tables are compiled
+    into one longest-first alternation instead; words that an overlapping match
+    could hide (e.g. 计算 in 计算法 hiding 算法) are then rechecked with a substring
+    test. Either way, results equal testing each word separately.
+    """
+
+    # Up to this many distinct words, per-word substring tests are faster than one regex scan
+    SUBSTRING_MAX_WORDS = 32
+
+    def __init__(self, tables):
+        self.labels = {}      # table name -> [(rule bit, label)] in table order
+        self.word_bits = {}   # trigger word -> bitmask of the rules it triggers
+        bit = 1
+        for name, rules in tables.items():
+            self.labels[name] = []
+            for label, words in rules:
+                self.labels[name].append((bit, label))
+                for word in words:
+                    self.word_bits[word] = self.word_bits.get(word, 0) | bit
+                bit <<= 1
+        self.all_bits = bit - 1
+        # Words triggering more rules first, so the pass can stop earlier
+        self.words = sorted(self.word_bits.items(), key=lambda item: -bin(item[1]).count('1'))
+        self.pattern = None
+        if len(self.word_bits) > self.SUBSTRING_MAX_WORDS:
+            ordered = sorted(self.word_bits, key=len, reverse=True)
+            self.pattern = re.compile('|'.join(map(re.escape, ordered)))
+            self.shadowed = [w for w in ordered if any(o != w and _overlaps(o, w) for o in ordered)]
+
+    def match(self, text):
+        """Matched labels per table, in table order"""
+        hits = self._scan(text) if self.pattern is None else self._regex_scan(text)
+        return {name: [label for bit, label in labels if hits & bit]
+                for name, labels in self.labels.items()}
+
+    def _scan(self, text):
+        hits = 0
+        all_bits = self.all_bits
+        for word, bits in self.words:
+            if bits & ~hits and word in text:
+                hits |= bits
+                if hits == all_bits:
+                    break
+        return hits
+
+    def _regex_scan(self, text):
+        hits = 0
+        word_bits = self.word_bits
+        for m in self.pattern.finditer(text):
+            hits |= word_bits[m.group()]
+            if hits == self.all_bits:
+                break
+        else:
+            for word in self.shadowed:
+                if word_bits[word] & ~hits and word in text:
+                    hits |= word_bits[word]
+        return hits
+
+RULE_MATCHER = RuleMatcher({'keywords': KEYWORD_RULES, 'knowledge_type': KNOWLEDGE_TYPE_RULES})
+
+class SegmentIndex:
+    """Segments sorted by start time, queried by time range (ms) with bisect
+
+    Built by consuming a segment iterable once; times are kept in int64 arrays
+    and only the cue texts are held as Python objects.
+    """
+
+    def __init__(self, segments):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.texts = []
+        in_order = True
+        for seg in segments:
+            if self.starts and seg.start_ms < self.starts[-1]:
+                in_order = False
+            self.starts.append(seg.start_ms)
+            self.ends.append(seg.end_ms)
+            self.texts.append(seg.text)
+
+        if not in_order:
+            order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+            self.starts = array('q', (self.starts[i] for i in order))
+            self.ends = array('q', (self.ends[i] for i in order))
+            self.texts = [self.texts[i] for i in order]
+        # Running maximum of end times stays sorted even when cues overlap
+        self.max_ends = array('q', accumulate(self.ends, max))
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def duration_ms(self):
+        return self.max_ends[-1] if self.max_ends else 0
+
+    def overlapping(self, start, end):
+        """Indices of segments intersecting [start, end], in start order"""
+        lo = bisect_left(self.max_ends, start)
+        hi = bisect_right(self.starts, end)
+        return [i for i in range(lo, hi) if self.ends[i] >= start]
+
+    def texts_between(self, start, end):
+        return [self.texts[i] for i in self.overlapping(start, end)]
+
+def load_manifest(output_dir=OUTPUT_DIR):
+    try:
+        with open(output_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == CACHE_VERSION:
+            return manifest
+    except (OSError, ValueError):
         pass
+    return {'version': CACHE_VERSION, 'files': {}}
+
+def save_manifest(manifest, output_dir=OUTPUT_DIR):
+    """Write the manifest through a temp file so an interrupted run keeps the old one"""
+    output_dir.mkdir(exist_ok=True)
+    tmp_path = output_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_dir / MANIFEST_NAME)
+
+def ndjson_lines(slices, cache_key):
+    """Compact one-line records for every slice of a create_slices result"""
+    video = {
+        'source_file': slices['source_file'],
+        'cache_key': cache_key,
+        'video_title': slices['video_title'],
+        'total_duration_seconds': slices['total_duration_seconds'],
+        'slice_count': slices['slice_count'],
+    }
+    for item in slices['slices']:
+        record = dict(video, **item)
+        yield json.dumps({field: record[field] for field in NDJSON_FIELDS},
+                         ensure_ascii=False, separators=(',', ':'))
+
+def remove_ndjson_records(source_files, output_dir=OUTPUT_DIR):
+    """Drop the records of re-sliced sources before their new records are appended"""
+    path = output_dir / NDJSON_NAME
+    if not path.exists():
+        return
+    tmp_path = output_dir / (NDJSON_NAME + '.tmp')
+    with open(path, 'r', encoding='utf-8') as src, \
+            open(tmp_path, 'w', encoding='utf-8', buffering=NDJSON_BUFFER_SIZE) as dst:
+        for line in src:
+            if line.strip() and json.loads(line)['source_file'] not in source_files:
+                dst.write(line)
+    os.replace(tmp_path, path)
+
+# Per-file timing stages reported by --metrics / --metrics-jsonl
+METRIC_STAGES = ('parse', 'slice', 'index', 'serialize')
+
+def _slice_file_job(config, file_path, cache_key):
+    """Process pool entry point: slice one file with a fresh BatchSlicer"""
+    return BatchSlicer(**config).slice_file(file_path, cache_key)
 
-    def parse_time(self, time_str):
-        pattern = r'(\d{2}):(\d{2}):(\d{2}),(\d{3})'
-        match = re.match(pattern, time_str.strip())
-        if not match:
-            raise ValueError(f"Invalid time: {time_str}")
-        h, m, s, ms = map(int, match.groups())
-        return h * 3600 + m * 60 + s + ms / 1000
+class BatchSlicer:
+    def __init__(self, slice_count=6, target_length=None, output_format='json', build_index=False,
+                 profile_dir=None):
+        self.slice_count = slice_count
+        # Target slice length in seconds; when set, boundaries follow the content
+        self.target_length = target_length
+        # 'json' (one file per video), 'ndjson' (one line per slice) or 'both'
+        self.output_format = output_format
+        # Collect per-slice term statistics for the full-text search index
+        self.build_index = build_index
+        # When set, each file is run under cProfile and its stats saved here
+        self.profile_dir = profile_dir
+
+    def config(self):
+        """Constructor arguments, used to rebuild the slicer in pool workers"""
+        return {'slice_count': self.slice_count, 'target_length': self.target_length,
+                'output_format': self.output_format, 'build_index': self.build_index,
+                'profile_dir': self.profile_dir}
+
+    def cache_key(self, file_path):
+        """SHA-256 of the file content and the slicer parameters"""
+        digest = hashlib.sha256(
+            json.dumps([CACHE_VERSION, self.slice_count, self.target_length]).encode())
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def output_path(self, file_path, cache_key):
+        """Output name carries the key prefix, so a changed input never reuses a stale file"""
+        return OUTPUT_DIR / f"{Path(file_path).stem}_{cache_key[:12]}_slices_final.json"
 
     def format_time(self, seconds):
         td = timedelta(seconds=seconds)
@@ -24,89 +263,151 @@ class BatchSlicer:
         s = total % 60
         return f"{h:02d}:{m:02d}:{s:02d}"
 
-    def parse_file(self, file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        segments = []
-        paragraphs = content.split('\n\n')
-
-        for para in paragraphs:
-            if not para.strip():
-                continue
-            lines = para.strip().split('\n')
-            timestamp = None
-            text_lines = []
-
-            for line in lines:
-                line = line.strip()
-                if line.startswith('##'):
-                    continue
-                if '-->' in line:
-                    timestamp = line
-                elif line and not line.startswith('##'):
-                    text_lines.append(line)
-
-            if timestamp and text_lines:
-                try:
-                    start_str, end_str = timestamp.split('-->')
-                    start_time = self.parse_time(start_str)
-                    end_time = self.parse_time(end_str)
-                    text = ' '.join(text_lines)
-                    segments.append({
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'text': text
-                    })
-                except ValueError:
-                    continue
+    def iter_segments(self, file_path):
+        """Yield Segments from an SRT, WebVTT, ASS or Markdown transcript"""
+        return iter_file_segments(file_path)
 
+    def parse_file(self, file_path):
+        """Stream the file into a SegmentIndex"""
         video_title = Path(file_path).stem
-        return segments, video_title
+        return SegmentIndex(self.iter_segments(file_path)), video_title
 
-    def create_slices(self, segments, video_title, source_file):
-        if not segments:
+    def equal_boundaries(self, total_duration, slice_count):
+        """Edges of slice_count equal windows; the last one runs to the end"""
+        slice_duration = total_duration // slice_count
+        return [i * slice_duration for i in range(slice_count)] + [total_duration]
+
+    def boundary_scores(self, index):
+        """Score the cut before each cue (index 0 is never a cut) in one pass
+
+        Left/right term counts and their dot product and norms are updated as
+        cues slide across the cut, so the whole pass is linear in the text size.
+        """
+        count = len(index)
+        terms = [None] * count
+        left, right = {}, {}
+        dot = left_norm = right_norm = 0
+
+        def terms_at(i):
+            if terms[i] is None:
+                terms[i] = lexical_terms(index.texts[i])
+            return terms[i]
+
+        def add_right(i):
+            nonlocal dot, right_norm
+            for term in terms_at(i):
+                n = right.get(term, 0)
+                right_norm += 2 * n + 1
+                right[term] = n + 1
+                dot += left.get(term, 0)
+
+        def move_left(i):
+            nonlocal dot, left_norm, right_norm
+            for term in terms_at(i):
+                n = right[term] - 1
+                right_norm -= 2 * n + 1
+                right[term] = n
+                dot -= left.get(term, 0)
+                n = left.get(term, 0)
+                left_norm += 2 * n + 1
+                left[term] = n + 1
+                dot += right[term]
+
+        def drop_left(i):
+            nonlocal dot, left_norm
+            for term in terms[i]:
+                n = left[term] - 1
+                left_norm -= 2 * n + 1
+                left[term] = n
+                dot -= right.get(term, 0)
+            terms[i] = None
+
+        for i in range(min(LEXICAL_WINDOW, count)):
+            add_right(i)
+
+        scores = [0.0] * count
+        for i in range(1, count):
+            # Cue i-1 crosses to the left window; keep both windows LEXICAL_WINDOW wide
+            move_left(i - 1)
+            if i - 1 - LEXICAL_WINDOW >= 0:
+                drop_left(i - 1 - LEXICAL_WINDOW)
+            if i - 1 + LEXICAL_WINDOW < count:
+                add_right(i - 1 + LEXICAL_WINDOW)
+
+            similarity = dot / (left_norm * right_norm) ** 0.5 if left_norm and right_norm else 1.0
+            pause = max(0, index.starts[i] - index.max_ends[i - 1]) / 1000
+            pause_score = min(pause / LONG_PAUSE_SECONDS, 1.0)
+            scores[i] = PAUSE_WEIGHT * pause_score + (1 - PAUSE_WEIGHT) * (1 - similarity)
+        return scores
+
+    def detect_boundaries(self, index, target_length):
+        """Pick cuts near target_length apart at the best-scoring cue starts
+
+        Each slice ends at the highest-scoring cut that keeps its length within
+        [MIN_SLICE_RATIO, MAX_SLICE_RATIO] x target_length; no cut leaves a tail
+        shorter than the minimum.
+        """
+        total_duration = index.duration_ms // 1000
+        scores = self.boundary_scores(index)
+        min_length = target_length * MIN_SLICE_RATIO
+        max_length = target_length * MAX_SLICE_RATIO
+
+        boundaries = [0]
+        best = None
+        i = 1
+        while i < len(index):
+            cut = index.starts[i] // 1000
+            length = cut - boundaries[-1]
+            if length < min_length or total_duration - cut < min_length:
+                i += 1
+                continue
+            if length <= max_length:
+                if best is None or scores[i] > scores[best]:
+                    best = i
+                i += 1
+                continue
+            # Past the longest allowed slice: cut at the best candidate seen,
+            # or here if the window had no candidate, and rescan from the cut
+            chosen = best if best is not None else i
+            boundaries.append(index.starts[chosen] // 1000)
+            best = None
+            i = chosen + 1
+
+        if best is not None and total_duration - boundaries[-1] > max_length:
+            boundaries.append(index.starts[best] // 1000)
+        boundaries.append(total_duration)
+        return boundaries
+
+    def create_slices(self, segments, video_title, source_file, slice_count=6, boundaries=None):
+        """Slice segments (SegmentIndex or iterable of Segments) into windows
+
+        boundaries is an ascending list of edges in seconds; slice i spans
+        boundaries[i]..boundaries[i+1]. Without it, slice_count equal windows are used.
+        """
+        index = segments if isinstance(segments, SegmentIndex) else SegmentIndex(segments)
+        if not len(index):
             return {}
 
-        total_duration = int(segments[-1]['end_time'])
-        
-        # Always create 6 slices for good granularity
-        slice_count = 6
-        slice_duration = total_duration // slice_count
+        total_duration = index.duration_ms // 1000
+        if boundaries is None:
+            boundaries = self.equal_boundaries(total_duration, slice_count)
+        slice_count = len(boundaries) - 1
 
         slices = []
         for i in range(slice_count):
-            start_time = i * slice_duration
-            end_time = min((i + 1) * slice_duration, total_duration)
-
-            slice_texts = []
-            for seg in segments:
-                if start_time <= seg['start_time'] <= end_time or start_time <= seg['end_time'] <= end_time:
-                    slice_texts.append(seg['text'])
-
-            combined_text = ' '.join(slice_texts)[:800] if slice_texts else ""
-
-            # Enhanced keyword extraction
-            keywords = []
-            if any(word in combined_text for word in ['计算', '公式', '算法', '求解']):
-                keywords.append('计算方法')
-            if any(word in combined_text for word in ['概念', '定义', '含义']):
-                keywords.append('基本概念')
-            if any(word in combined_text for word in ['案例', '例题', '应用']):
-                keywords.append('案例分析')
-            if any(word in combined_text for word in ['总结', '回顾', '要点']):
-                keywords.append('知识点总结')
-            if any(word in combined_text for word in ['背景', '导入', '导学']):
-                keywords.append('背景导入')
-
-            if not keywords:
-                keywords = [f"核心知识点{i+1}"]
-
-            # Determine knowledge type
-            if any(word in combined_text for word in ['计算', '公式', '算法']):
-                knowledge_type = "计算方法"
-            elif any(word in combined_text for word in ['案例', '例题', '应用']):
-                knowledge_type = "案例分析"
+            start_time = boundaries[i]
+            end_time = boundaries[i + 1]
+
+            slice_texts = index.texts_between(start_time * 1000, end_time * 1000)
+
+            combined_text = ' '.join(slice_texts)
+
+            # Keyword and knowledge type rules, one scan over the whole slice text
+            matched = RULE_MATCHER.match(combined_text)
+            keywords = matched['keywords'] or [f"核心知识点{i+1}"]
+
+            if matched['knowledge_type']:
+                knowledge_type = matched['knowledge_type'][0]
             elif i == 0:
                 knowledge_type = "章节导学"
             elif i == slice_count - 1:
@@ -175,6 +476,13 @@ class BatchSlicer:
         if file_path.name.endswith('_slices.json') or file_path.name.endswith('_slices_simple.json') or file_path.name.endswith('_slices_final.json'):
             return False
         
+        suffix = file_path.suffix.lower()
+        if suffix not in SUBTITLE_EXTENSIONS:
+            return False
+        if suffix != '.md':
+            return True
+
+        # Markdown files are only transcripts if they contain SRT timing lines
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 if '-->' in f.read(1024):
@@ -184,59 +492,141 @@ class BatchSlicer:
         
         return False
 
-    def process_file(self, file_path):
-        file_path = Path(file_path)
-        if not file_path.exists():
-            print(f"Error: File not found - {file_path}")
-            return False
-
-        print(f"\n{'='*60}")
-        print(f"Processing: {file_path.name}")
-        print(f"{'='*60}")
+    def slice_file(self, file_path, cache_key=None):
+        """Parse, slice and save one file; returns a result record instead of printing
 
+        Progress lines, per-stage timings and any exception (with its traceback
+        text) are captured in the record so pool workers never interleave their output.
+        """
+        if not self.profile_dir:
+            return self._slice_file(Path(file_path), cache_key)
+        profiler = cProfile.Profile()
         try:
-            print("Parsing subtitle file...")
-            segments, video_title = self.parse_file(str(file_path))
-            print(f"  ✓ Parsed {len(segments)} segments")
+            return profiler.runcall(self._slice_file, Path(file_path), cache_key)
+        finally:
+            Path(self.profile_dir).mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(Path(self.profile_dir) / f"{Path(file_path).name}.prof")
+
+    def _slice_file(self, file_path, cache_key):
+        result = {'file': file_path.name, 'ok': False, 'log': [], 'error': None, 'traceback': None,
+                  'output': None, 'slice_count': None, 'ndjson': None, 'slices': None, 'terms': None}
+        metrics = result['metrics'] = {'bytes_read': 0, 'segments': 0, 'slices': 0}
+        metrics.update((f'{stage}_ms', 0.0) for stage in METRIC_STAGES)
+        log = result['log'].append
+        if not file_path.exists():
+            result['error'] = f"File not found - {file_path}"
+            return result
 
-            if not segments:
-                print("  ✗ No valid segments found")
-                return False
+        def lap(stage, started):
+            now = time.perf_counter()
+            metrics[f'{stage}_ms'] = round((now - started) * 1000, 3)
+            return now
 
-            total_duration = segments[-1]['end_time']
-            print(f"  ✓ Total duration: {total_duration:.1f}s ({total_duration/60:.1f}min)")
+        started = time.perf_counter()
+        try:
+            log("Parsing subtitle file...")
+            metrics['bytes_read'] = file_path.stat().st_size
+            index, video_title = self.parse_file(str(file_path))
+            metrics['segments'] = len(index)
+            started = lap('parse', started)
+            log(f"  ✓ Parsed {len(index)} segments")
+
+            if not len(index):
+                log("  ✗ No valid segments found")
+                return result
+
+            total_duration = index.duration_ms / 1000
+            log(f"  ✓ Total duration: {total_duration:.1f}s ({total_duration/60:.1f}min)")
+
+            if self.target_length:
+                log(f"\nDetecting boundaries (target {self.target_length / 60:.1f}min)...")
+                boundaries = self.detect_boundaries(index, self.target_length)
+            else:
+                log(f"\nCreating {self.slice_count} slices...")
+                boundaries = None
+            slices = self.create_slices(index, video_title, file_path.name, self.slice_count, boundaries)
+            metrics['slices'] = slices['slice_count']
+            started = lap('slice', started)
+            log(f"  ✓ Created {slices['slice_count']} slices")
+
+            if self.build_index:
+                result['slices'] = slices
+                result['terms'] = collect_slice_terms(index, slices)
+                started = lap('index', started)
+
+            log("\nSaving results...")
+            cache_key = cache_key or self.cache_key(file_path)
+            if self.output_format != 'ndjson':
+                OUTPUT_DIR.mkdir(exist_ok=True)
+                output_file = self.output_path(file_path, cache_key)
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump(slices, f, ensure_ascii=False, indent=2)
+                log(f"  ✓ Saved: {output_file}")
+                result['output'] = output_file.name
+            if self.output_format != 'json':
+                # Lines go back to the caller, which is the only writer of the NDJSON file
+                result['ndjson'] = list(ndjson_lines(slices, cache_key))
+                log(f"  ✓ {len(result['ndjson'])} NDJSON records")
+            lap('serialize', started)
+            result['ok'] = True
+            result['slice_count'] = slices['slice_count']
 
-            print("\nCreating 6 slices...")
-            result = self.create_slices(segments, video_title, file_path.name)
-            print(f"  ✓ Created {result['slice_count']} slices")
+        except Exception as e:
+            result['error'] = str(e) or type(e).__name__
+            result['traceback'] = traceback.format_exc()
+        return result
 
-            print("\nSaving results...")
-            output_dir = Path("slices_output_final")
-            output_dir.mkdir(exist_ok=True)
-            timestamp = "20251208_150000"
-            output_file = output_dir / f"{video_title}_{timestamp}_slices_final.json"
+    def print_result(self, result):
+        print(f"\n{'='*60}")
+        print(f"Processing: {result['file']}")
+        print(f"{'='*60}")
+        for line in result['log']:
+            print(line)
+        if result['error'] is not None:
+            print(f"  ✗ Failed: {result['error']}")
+        if result['traceback']:
+            print('\n'.join('    ' + line for line in result['traceback'].rstrip().splitlines()))
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+    def process_file(self, file_path):
+        result = self.slice_file(file_path)
+        self.print_result(result)
+        if result['ndjson']:
+            OUTPUT_DIR.mkdir(exist_ok=True)
+            with open(OUTPUT_DIR / NDJSON_NAME, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(result['ndjson']) + '\n')
+        return result['ok']
+
+    def is_cached(self, entry, cache_key):
+        """Whether the manifest entry already holds every output this run would produce"""
+        if not entry or entry['cache_key'] != cache_key:
+            return False
+        if self.output_format != 'ndjson':
+            if not entry.get('output') or not (OUTPUT_DIR / entry['output']).exists():
+                return False
+        if self.output_format != 'json':
+            if not entry.get('ndjson') or not (OUTPUT_DIR / NDJSON_NAME).exists():
+                return False
+        return True
 
-            print(f"  ✓ Saved: {output_file}")
-            return True
+    def process_all(self, jobs=1, force=False, metrics=False, metrics_jsonl=None):
+        """Process all subtitle files in current directory
 
-        except Exception as e:
-            print(f"  ✗ Failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
+        Files whose content hash and slicer parameters match the manifest and whose
+        outputs still exist are skipped (unless force). NDJSON records are appended
+        through one buffered writer, after dropping the old records of re-sliced
+        files. With jobs > 1 files are sliced in a process pool; results are
+        printed and counted in file order, so the summary is the same as a serial run.
 
-    def process_all(self):
-        """Process all subtitle files in current directory"""
+        metrics prints a per-stage summary table; metrics_jsonl appends one JSON
+        line of per-file metrics to that path.
+        """
         print("\n" + "="*60)
         print("  Batch Subtitle Slicer")
         print("  Processing All Files")
         print("="*60 + "\n")
         
-        # Get all .md files
-        md_files = [f for f in Path('.').glob('*.md') if self.is_subtitle_file(f)]
+        # Get all subtitle files (.md transcripts, .srt, .vtt, .ass/.ssa)
+        md_files = sorted(f for f in Path('.').iterdir() if f.is_file() and self.is_subtitle_file(f))
         
         if not md_files:
             print("No subtitle files found!")
@@ -245,25 +635,193 @@ class BatchSlicer:
         print(f"Found {len(md_files)} subtitle files\n")
         
         success = 0
-        failed = 0
-        
-        for i, file_path in enumerate(md_files, 1):
-            print(f"[{i}/{len(md_files)}] ", end="")
-            if self.process_file(file_path):
+        failed = []
+        skipped = 0
+
+        run_started = time.perf_counter()
+        manifest = load_manifest()
+        search_index = SliceIndex.load(OUTPUT_DIR) if self.build_index else None
+        pending = []
+        for file_path in md_files:
+            key = self.cache_key(file_path)
+            entry = manifest['files'].get(file_path.name)
+            # The index must hold postings from this exact input and parameters; a run
+            # without --index may have re-sliced the file since they were added
+            indexed = search_index is None or (
+                search_index.videos.get(file_path.name, {}).get('cache_key') == key)
+            if not force and indexed and self.is_cached(entry, key):
+                skipped += 1
+                continue
+            pending.append((file_path, key))
+        hash_seconds = time.perf_counter() - run_started
+        if skipped:
+            print(f"Skipping {skipped} unchanged files (cached in {OUTPUT_DIR / MANIFEST_NAME})")
+
+        # Old records go only when this run rewrites them or they are stale; a JSON-only
+        # run over unchanged sources keeps them, as an NDJSON-only run keeps JSON files
+        replaced = set()
+        for path, key in pending:
+            entry = manifest['files'].get(path.name, {})
+            if entry.get('ndjson') and (self.output_format != 'json' or entry['cache_key'] != key):
+                replaced.add(path.name)
+        if replaced:
+            remove_ndjson_records(replaced)
+            for name in replaced:
+                manifest['files'][name]['ndjson'] = False
+            save_manifest(manifest)
+        if search_index is not None:
+            # Postings of re-sliced files are dropped in one pass and re-added on success
+            search_index.remove({path.name for path, _ in pending})
+        ndjson_writer = None
+        file_metrics = []
+        metrics_writer = open(metrics_jsonl, 'a', encoding='utf-8') if metrics_jsonl else None
+
+        if jobs > 1 and len(pending) > 1:
+            print(f"Using {jobs} worker processes")
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            config = self.config()
+            results = executor.map(_slice_file_job, repeat(config),
+                                   [path for path, _ in pending], [key for _, key in pending])
+        else:
+            executor = None
+            results = (self.slice_file(path, key) for path, key in pending)
+
+        try:
+            for i, (result, (file_path, key)) in enumerate(zip(results, pending), 1):
+                print(f"[{i}/{len(pending)}] ", end="")
+                self.print_result(result)
+                record = dict(file=result['file'], ok=result['ok'], **result['metrics'])
+                file_metrics.append(record)
+                if metrics_writer is not None:
+                    metrics_writer.write(json.dumps(record, ensure_ascii=False) + '\n')
+                if not result['ok']:
+                    failed.append(result)
+                    continue
                 success += 1
-            else:
-                failed += 1
+                if result['ndjson']:
+                    if ndjson_writer is None:
+                        OUTPUT_DIR.mkdir(exist_ok=True)
+                        ndjson_writer = open(OUTPUT_DIR / NDJSON_NAME, 'a', encoding='utf-8',
+                                             buffering=NDJSON_BUFFER_SIZE)
+                    ndjson_writer.write('\n'.join(result['ndjson']) + '\n')
+                if search_index is not None:
+                    search_index.add(result['slices'], result['terms'], key)
+
+                previous = manifest['files'].get(file_path.name)
+                output = result['output']
+                if previous and previous.get('output') and previous['output'] != output:
+                    if previous['cache_key'] == key and output is None:
+                        output = previous['output']  # NDJSON-only run; the JSON file is still current
+                    else:
+                        (OUTPUT_DIR / previous['output']).unlink(missing_ok=True)
+                manifest['files'][file_path.name] = {
+                    'cache_key': key,
+                    'output': output,
+                    'ndjson': bool(result['ndjson']) or (
+                        bool(previous and previous.get('ndjson')) and file_path.name not in replaced),
+                    'slice_count': result['slice_count'],
+                    'params': {'slice_count': self.slice_count, 'target_length': self.target_length},
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                }
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            # Flush the NDJSON records before the manifest says they exist
+            if ndjson_writer is not None:
+                ndjson_writer.close()
+            if metrics_writer is not None:
+                metrics_writer.close()
+            if search_index is not None and pending:
+                search_index.save(OUTPUT_DIR)
+            if success:
+                save_manifest(manifest)
         
         print(f"\n{'='*60}")
         print(f"Batch Processing Complete!")
         print(f"{'='*60}")
         print(f"Success: {success} files")
-        print(f"Failed: {failed} files")
+        if skipped:
+            print(f"Skipped (unchanged): {skipped} files")
+        print(f"Failed: {len(failed)} files")
+        for result in failed:
+            print(f"  - {result['file']}: {result['error'] or 'no valid segments'}")
         print(f"Total: {len(md_files)} files")
+        if metrics:
+            self.print_metrics(file_metrics, hash_seconds, time.perf_counter() - run_started, jobs)
+        if self.profile_dir and pending:
+            self.print_profile([path.name for path, _ in pending])
         print(f"\nOutput directory: slices_output_final/")
+        if self.output_format != 'json':
+            print(f"NDJSON records: {OUTPUT_DIR / NDJSON_NAME}")
+        if search_index is not None:
+            print(f"Search index: {OUTPUT_DIR / INDEX_NAME} ({len(search_index.videos)} videos, "
+                  f"{len(search_index.postings)} terms); query with slice_index.py")
         print(f"View results: ls -lah slices_output_final/")
         print(f"{'='*60}\n")
 
+    def print_metrics(self, file_metrics, hash_seconds, wall_seconds, jobs):
+        """Summary table of where the time went, plus the slowest files"""
+        total_bytes = sum(m['bytes_read'] for m in file_metrics)
+        total_segments = sum(m['segments'] for m in file_metrics)
+        stage_seconds = [('hash (cache check)', hash_seconds)] + [
+            (stage, sum(m[f'{stage}_ms'] for m in file_metrics) / 1000) for stage in METRIC_STAGES]
+        busy = sum(seconds for _, seconds in stage_seconds) or 1
+
+        print(f"\nStage metrics: {len(file_metrics)} files, {total_bytes / 1e6:.1f} MB, "
+              f"{total_segments} segments")
+        print(f"  {'stage':<20}{'total':>10}{'share':>8}{'per file':>12}")
+        for stage, seconds in stage_seconds:
+            per_file = seconds / len(file_metrics) * 1000 if file_metrics else 0
+            print(f"  {stage:<20}{seconds:>9.2f}s{seconds / busy:>8.1%}{per_file:>10.1f}ms")
+        print(f"  wall time {wall_seconds:.2f}s with {jobs} job(s): "
+              f"{total_bytes / 1e6 / wall_seconds:.1f} MB/s, {total_segments / wall_seconds:,.0f} segments/s")
+
+        slowest = sorted(file_metrics, key=lambda m: -sum(m[f'{s}_ms'] for s in METRIC_STAGES))[:5]
+        if slowest:
+            print("  slowest files (parse / slice / index / serialize ms):")
+            for m in slowest:
+                stages = ' / '.join(f"{m[f'{s}_ms']:.0f}" for s in METRIC_STAGES)
+                print(f"    {m['file']}: {stages} ({m['bytes_read'] / 1e6:.1f} MB, {m['segments']} segments)")
+
+    def print_profile(self, file_names, limit=20):
+        """Merge this run's per-file cProfile stats and print the top functions"""
+        paths = [str(Path(self.profile_dir) / f"{name}.prof") for name in file_names]
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            return
+        print(f"\ncProfile ({len(paths)} files in {self.profile_dir}), top {limit} by cumulative time:")
+        pstats.Stats(*paths).sort_stats('cumulative').print_stats(limit)
+
+def _get_option(name, default, cast=str, valid=None, requirement='a value'):
+    """Read the value after an option; a missing or invalid value exits with an error"""
+    if name not in sys.argv:
+        return default
+    idx = sys.argv.index(name)
+    if idx + 1 < len(sys.argv) and not sys.argv[idx + 1].startswith('--'):
+        try:
+            value = cast(sys.argv[idx + 1])
+        except ValueError:
+            pass
+        else:
+            if valid is None or valid(value):
+                return value
+    print(f"Error: {name} requires {requirement}")
+    sys.exit(1)
+
 if __name__ == "__main__":
-    slicer = BatchSlicer()
-    slicer.process_all()
+    slice_count = _get_option('--slices', 6, int, lambda n: n >= 1, 'a positive integer')
+    target_minutes = _get_option('--target-minutes', None, float, lambda m: m > 0,
+                                 'a number of minutes greater than 0')
+    target_length = target_minutes * 60 if target_minutes is not None else None
+    jobs = max(1, _get_option('--jobs', 1, int, requirement='an integer'))
+    force = '--force' in sys.argv
+    output_format = _get_option('--output', 'json', valid=lambda f: f in OUTPUT_FORMATS,
+                                requirement=f"one of {', '.join(OUTPUT_FORMATS)}")
+
+    build_index = '--index' in sys.argv
+    metrics = '--metrics' in sys.argv
+    metrics_jsonl = _get_option('--metrics-jsonl', None, requirement='a file path')
+    profile_dir = _get_option('--profile', None, requirement='a directory')
+
+    slicer = BatchSlicer(slice_count, target_length, output_format, build_index, profile_dir)
+    slicer.process_all(jobs, force, metrics, metrics_jsonl)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Batch slicer benchmarks
+- parse: compare the original Markdown parser (read + split + per-line re.match)
+  with the streaming per-format parsers on synthetic SRT, WebVTT, ASS and Markdown files
+- keywords: compare the original per-rule any() scans over the first 800 characters
+  with the one-pass rule table over the whole slice text
+"""
+
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import batch_slicer
+from batch_slicer import RULE_MATCHER, BatchSlicer, SegmentIndex
+from subtitle_formats import Segment, iter_file_segments
+
+TRIGGER_WORDS = ['计算', '公式', '概念', '定义', '案例', '应用', '总结', '要点', '背景', '导入']
+FILLER_WORDS = ['我们', '今天', '学习', '函数', '变量', '矩阵', '概率', '模型', '数据', '方法',
+                '这个', '那么', '所以', '因为', '然后', '就是', '其实', '同学', '大家', '看一下',
+                '问题', '结果', '这里', '一个', '可以', '需要', '注意', '比如', '如果', '的话']
+
+def legacy_parse_time(time_str):
+    pattern = r'(\d{2}):(\d{2}):(\d{2}),(\d{3})'
+    match = re.match(pattern, time_str.strip())
+    if not match:
+        raise ValueError(f"Invalid time: {time_str}")
+    h, m, s, ms = map(int, match.groups())
+    return h * 3600 + m * 60 + s + ms / 1000
+
+def legacy_parse_file(file_path):
+    """The original BatchSlicer.parse_file, kept as the baseline"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    segments = []
+    for para in content.split('\n\n'):
+        if not para.strip():
+            continue
+        timestamp = None
+        text_lines = []
+        for line in para.strip().split('\n'):
+            line = line.strip()
+            if line.startswith('##'):
+                continue
+            if '-->' in line:
+                timestamp = line
+            elif line:
+                text_lines.append(line)
+        if timestamp and text_lines:
+            try:
+                start_str, end_str = timestamp.split('-->')
+                segments.append({
+                    'start_time': legacy_parse_time(start_str),
+                    'end_time': legacy_parse_time(end_str),
+                    'text': ' '.join(text_lines),
+                })
+            except ValueError:
+                continue
+    return segments
+
+def legacy_classify(combined_text):
+    """The original keyword and knowledge type checks (without positional fallbacks)"""
+    keywords = []
+    if any(word in combined_text for word in ['计算', '公式', '算法', '求解']):
+        keywords.append('计算方法')
+    if any(word in combined_text for word in ['概念', '定义', '含义']):
+        keywords.append('基本概念')
+    if any(word in combined_text for word in ['案例', '例题', '应用']):
+        keywords.append('案例分析')
+    if any(word in combined_text for word in ['总结', '回顾', '要点']):
+        keywords.append('知识点总结')
+    if any(word in combined_text for word in ['背景', '导入', '导学']):
+        keywords.append('背景导入')
+
+    if any(word in combined_text for word in ['计算', '公式', '算法']):
+        knowledge_type = "计算方法"
+    elif any(word in combined_text for word in ['案例', '例题', '应用']):
+        knowledge_type = "案例分析"
+    else:
+        knowledge_type = None
+    return keywords, knowledge_type
+
+class LegacyMatcher:
+    """Stands in for RULE_MATCHER so create_slices runs the original checks on text[:800]"""
+
+    def match(self, text):
+        keywords, knowledge_type = legacy_classify(text[:800])
+        return {'keywords': keywords, 'knowledge_type': [knowledge_type] if knowledge_type else []}
+
+def clock(ms, separator, hour_digits=2, fraction_digits=3):
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    fraction = ms if fraction_digits == 3 else ms // 10
+    return f"{h:0{hour_digits}d}:{m:02d}:{s:02d}{separator}{fraction:0{fraction_digits}d}"
+
+def generate_cues(count, seed, trigger_ratio=0.05):
+    """Synthetic cues; trigger_ratio is the share of keyword trigger words in the text"""
+    rng = random.Random(seed)
+
+    def word():
+        return rng.choice(TRIGGER_WORDS if rng.random() < trigger_ratio else FILLER_WORDS)
+
+    t = 0
+    cues = []
+    for _ in range(count):
+        t += rng.randint(0, 400)
+        duration = rng.randint(800, 4000)
+        cues.append((t, t + duration, ''.join(word() for _ in range(rng.randint(3, 12)))))
+        t += duration
+    return cues
+
+def write_samples(directory, cues):
+    """Write the same cues as .md, .srt, .vtt and .ass files"""
+    directory = Path(directory)
+    md = ['## 字幕', '']
+    srt = []
+    vtt = ['WEBVTT', '']
+    ass = ['[Script Info]', 'ScriptType: v4.00+', '', '[Events]',
+           'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text']
+    for i, (start, end, text) in enumerate(cues, 1):
+        timing = f"{clock(start, ',')} --> {clock(end, ',')}"
+        md += [timing, text, '']
+        srt += [str(i), timing, text, '']
+        vtt += [f"{clock(start, '.')} --> {clock(end, '.')} align:start", f"<v 讲师>{text}", '']
+        ass.append(f"Dialogue: 0,{clock(start, '.', 1, 2)},{clock(end, '.', 1, 2)},Default,,0,0,0,,{text}")
+
+    paths = {}
+    for suffix, lines in (('md', md), ('srt', srt), ('vtt', vtt), ('ass', ass)):
+        paths[suffix] = directory / f"sample.{suffix}"
+        paths[suffix].write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return paths
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_parse(count, seed, repeat):
+    cues = generate_cues(count, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_samples(tmp, cues)
+        print(f"{count} cues per file, best of {repeat}\n")
+        print(f"{'parser':<24}{'format':<8}{'segments':>10}{'time':>12}{'cues/s':>14}")
+
+        legacy_time, legacy_segments = best_of(lambda: legacy_parse_file(paths['md']), repeat)
+        print(f"{'legacy (split+re.match)':<24}{'md':<8}{len(legacy_segments):>10}"
+              f"{legacy_time * 1000:>10.1f}ms{count / legacy_time:>14,.0f}")
+
+        for fmt, path in paths.items():
+            elapsed, segments = best_of(lambda: list(iter_file_segments(path)), repeat)
+            print(f"{'streaming':<24}{fmt:<8}{len(segments):>10}"
+                  f"{elapsed * 1000:>10.1f}ms{count / elapsed:>14,.0f}")
+
+def bench_keywords(count, seed, repeat):
+    slicer = BatchSlicer()
+    print(f"{count} cues, best of {repeat}, time per slice")
+    for trigger_ratio in (0.05, 0.005):
+        cues = generate_cues(count, seed, trigger_ratio)
+        index = SegmentIndex(Segment(start, end, text) for start, end, text in cues)
+        print(f"\ntrigger words: {trigger_ratio:.1%} of words")
+        print(f"{'slices':>6}{'chars/slice':>13}{'legacy [:800]':>16}{'legacy full':>14}{'rule table':>13}")
+        bench_keyword_slices(slicer, index, repeat)
+
+        # End to end: the scan runs on the slice text create_slices already joins
+        for slice_count in (6, 96):
+            timings = []
+            for matcher in (LegacyMatcher(), RULE_MATCHER):
+                batch_slicer.RULE_MATCHER = matcher
+                timings.append(best_of(lambda: slicer.create_slices(index, 'bench', 'bench.srt', slice_count), repeat)[0])
+            batch_slicer.RULE_MATCHER = RULE_MATCHER
+            print(f"create_slices, {slice_count} slices: legacy [:800] {timings[0] * 1000:.2f}ms, "
+                  f"rule table {timings[1] * 1000:.2f}ms per file")
+
+def bench_keyword_slices(slicer, index, repeat):
+    for slice_count in (6, 24, 96):
+        edges = slicer.equal_boundaries(index.duration_ms // 1000, slice_count)
+        texts = [' '.join(index.texts_between(a * 1000, b * 1000)) for a, b in zip(edges, edges[1:])]
+
+        truncated, _ = best_of(lambda: [legacy_classify(t[:800]) for t in texts], repeat)
+        full, expected = best_of(lambda: [legacy_classify(t) for t in texts], repeat)
+        table, matched = best_of(lambda: [RULE_MATCHER.match(t) for t in texts], repeat)
+        for (keywords, knowledge_type), result in zip(expected, matched):
+            assert result['keywords'] == keywords
+            assert (result['knowledge_type'] or [None])[0] == knowledge_type
+
+        per_slice = lambda seconds: f"{seconds / slice_count * 1e6:.1f}us"
+        print(f"{slice_count:>6}{sum(map(len, texts)) // slice_count:>13,}"
+              f"{per_slice(truncated):>16}{per_slice(full):>14}{per_slice(table):>13}")
+
+def _get_option(name, default, cast):
+    """Read the value after an option"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return cast(sys.argv[idx + 1])
+    return default
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('parse', 'keywords'):
+        print("Usage: python benchmark.py parse|keywords [--cues N] [--seed N] [--repeat N]")
+        print("  parse: legacy Markdown parser vs streaming SRT/WebVTT/ASS/Markdown parsers")
+        print("  keywords: legacy any() keyword scans vs the one-pass rule table")
+        print("  --cues N: cues per generated file (default 50000)")
+        print("  --seed N: random seed (default 42)")
+        print("  --repeat N: runs per parser, best time is reported (default 3)")
+        sys.exit(1)
+
+    bench = bench_parse if sys.argv[1] == 'parse' else bench_keywords
+    bench(_get_option('--cues', 50000, int), _get_option('--seed', 42, int),
+          _get_option('--repeat', 3, int))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Full-text slice search index
+- Maintained by batch_slicer.py --index: term -> (video, slice_id, first timestamp) postings
+  over the transcript text of every slice, updated as files are (re-)sliced
+- Query: python slice_index.py QUERY [--dir slices_output_final] [--limit N]
+"""
+
+import json
+import math
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+INDEX_NAME = '.slices_index.json'
+INDEX_VERSION = 1
+
+# BM25 parameters for ranking slices
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TERM_PATTERN = re.compile(r'[\u4e00-\u9fff]+|[A-Za-z0-9]+')
+
+def lexical_terms(text):
+    """Lower-cased words plus character bigrams of Chinese runs"""
+    terms = []
+    for run in TERM_PATTERN.findall(text):
+        if run.isascii():
+            terms.append(run.lower())
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[j:j + 2] for j in range(len(run) - 1))
+    return terms
+
+def collect_slice_terms(segments, slices):
+    """Per-slice term statistics from a SegmentIndex and a create_slices result
+
+    Returns [(term count, {term: [tf, first_ms]})] in slice order; first_ms is
+    the start of the first cue in the slice that contains the term.
+    """
+    collected = []
+    for item in slices['slices']:
+        terms = {}
+        length = 0
+        for i in segments.overlapping(item['start_time_seconds'] * 1000, item['end_time_seconds'] * 1000):
+            cue_ms = segments.starts[i]
+            for term in lexical_terms(segments.texts[i]):
+                length += 1
+                stats = terms.get(term)
+                if stats is None:
+                    terms[term] = [1, cue_ms]
+                else:
+                    stats[0] += 1
+        collected.append((length, terms))
+    return collected
+
+class SliceIndex:
+    """Inverted index over slice transcripts
+
+    videos: {source_file: {video_title, cache_key, slices: [[name, start_ms, end_ms, length]], terms}}
+    postings: {term: [[source_file, slice_id, tf, first_ms]]}
+    The per-video term list lets a re-sliced file drop only its own postings.
+    """
+
+    def __init__(self, videos=None, postings=None):
+        self.videos = videos or {}
+        self.postings = postings or {}
+
+    @classmethod
+    def load(cls, output_dir):
+        """Read the index; a missing or outdated file gives an empty index"""
+        try:
+            with open(Path(output_dir) / INDEX_NAME, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get('version') != INDEX_VERSION:
+            return cls()
+        return cls(data.get('videos'), data.get('postings'))
+
+    def save(self, output_dir):
+        output_dir = Path(output_dir)
+        output_dir.mkdir(exist_ok=True)
+        tmp_path = output_dir / (INDEX_NAME + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'videos': self.videos, 'postings': self.postings},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, output_dir / INDEX_NAME)
+
+    def remove(self, source_files):
+        """Drop videos; each affected posting list is filtered once for all of them"""
+        affected = set()
+        for source_file in source_files:
+            video = self.videos.pop(source_file, None)
+            if video is not None:
+                affected.update(video['terms'])
+        for term in affected:
+            remaining = [p for p in self.postings.get(term, ()) if p[0] not in source_files]
+            if remaining:
+                self.postings[term] = remaining
+            else:
+                self.postings.pop(term, None)
+
+    def add(self, slices, slice_terms, cache_key=None):
+        """Add one video from its create_slices result and collect_slice_terms
+
+        cache_key is the slicer cache key of the output the postings came from.
+        """
+        source_file = slices['source_file']
+        if source_file in self.videos:
+            self.remove({source_file})
+        all_terms = set()
+        for item, (_, terms) in zip(slices['slices'], slice_terms):
+            for term, (tf, first_ms) in terms.items():
+                self.postings.setdefault(term, []).append([source_file, item['slice_id'], tf, first_ms])
+            all_terms.update(terms)
+        self.videos[source_file] = {
+            'video_title': slices['video_title'],
+            'cache_key': cache_key,
+            'slices': [[item['slice_name'], item['start_time_seconds'] * 1000,
+                        item['end_time_seconds'] * 1000, length]
+                       for item, (length, _) in zip(slices['slices'], slice_terms)],
+            'terms': sorted(all_terms),
+        }
+
+    def search(self, query, limit=10):
+        """Slices ranked by BM25 over the query's terms
+
+        Each hit's timestamp_ms is where its rarest matched term is first said.
+        """
+        terms = list(dict.fromkeys(lexical_terms(query)))
+        slice_count = sum(len(video['slices']) for video in self.videos.values())
+        if not terms or not slice_count:
+            return []
+        avg_length = sum(s[3] for video in self.videos.values() for s in video['slices']) / slice_count or 1
+
+        scores = {}   # (source_file, slice_id) -> score
+        anchors = {}  # (source_file, slice_id) -> (idf, first_ms) of the rarest matched term
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (slice_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for source_file, slice_id, tf, first_ms in postings:
+                key = (source_file, slice_id)
+                length = self.videos[source_file]['slices'][slice_id - 1][3]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                if key not in anchors or idf > anchors[key][0]:
+                    anchors[key] = (idf, first_ms)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        results = []
+        for (source_file, slice_id), score in ranked:
+            video = self.videos[source_file]
+            name, start_ms, end_ms, _ = video['slices'][slice_id - 1]
+            results.append({
+                'source_file': source_file,
+                'video_title': video['video_title'],
+                'slice_id': slice_id,
+                'slice_name': name,
+                'slice_start_ms': start_ms,
+                'slice_end_ms': end_ms,
+                'timestamp_ms': anchors[(source_file, slice_id)][1],
+                'score': round(score, 4),
+            })
+        return results
+
+def format_ms(ms):
+    seconds, ms = divmod(ms, 1000)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}.{ms:03d}"
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('--help', '-h'):
+        print("Usage: python slice_index.py QUERY [--dir PATH] [--limit N] [--json]")
+        print("  QUERY: words or Chinese phrases, e.g. 案例分析")
+        print("  --dir PATH: slicer output directory (default: slices_output_final)")
+        print("  --limit N: number of results (default 10)")
+        print("  --json: print results as JSON lines")
+        print(f"The index file {INDEX_NAME} is built by batch_slicer.py --index")
+        sys.exit(0 if len(sys.argv) > 1 else 1)
+
+    query = sys.argv[1]
+    output_dir = Path('slices_output_final')
+    limit = 10
+    for idx, arg in enumerate(sys.argv[:-1]):
+        value = sys.argv[idx + 1]
+        if arg == '--dir':
+            output_dir = Path(value)
+        elif arg == '--limit':
+            limit = int(value)
+
+    if not (output_dir / INDEX_NAME).exists():
+        print(f"Error: index not found - {output_dir / INDEX_NAME}")
+        print("  Run: python batch_slicer.py --index")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    index = SliceIndex.load(output_dir)
+    loaded = time.perf_counter()
+    results = index.search(query, limit)
+    searched = time.perf_counter()
+
+    if '--json' in sys.argv:
+        for result in results:
+            print(json.dumps(result, ensure_ascii=False))
+        return
+
+    for result in results:
+        print(f"{result['score']:8.3f}  {format_ms(result['timestamp_ms'])}  ({result['timestamp_ms']} ms)  "
+              f"{result['video_title']} #{result['slice_id']} {result['slice_name']}")
+    print(f"\n{len(results)} results (load {(loaded - start) * 1000:.1f}ms, "
+          f"search {(searched - loaded) * 1000:.1f}ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Subtitle format detection and streaming parsers
+
+Supported inputs: SRT, WebVTT, ASS/SSA and SRT-style Markdown transcripts
+('##' headings, produced by the SRT -> Markdown step). Files are read line by
+line; each format matches its timing lines with a single precompiled regex
+and yields Segment records with integer millisecond times.
+"""
+import re
+from pathlib import Path
+
+SUBTITLE_EXTENSIONS = ('.md', '.srt', '.vtt', '.ass', '.ssa')
+
+SRT_TIMING = re.compile(
+    r'(\d{1,3}):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d{1,3}):(\d{2}):(\d{2})[,.](\d{3})')
+# Hours are optional in WebVTT; cue settings after the end time are ignored
+VTT_TIMING = re.compile(
+    r'(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})')
+# Standard v4+ event order: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+ASS_DIALOGUE = re.compile(
+    r'Dialogue:\s*[^,]*,(\d+):(\d{2}):(\d{2})\.(\d{2}),(\d+):(\d{2}):(\d{2})\.(\d{2}),(?:[^,]*,){6}(.*)')
+
+MARKUP = re.compile(r'<[^>]*>')
+ASS_OVERRIDES = re.compile(r'\{[^}]*\}|\\[Nnh]')
+VTT_SKIPPED_BLOCKS = ('WEBVTT', 'NOTE', 'STYLE', 'REGION')
+
+class Segment:
+    """One subtitle cue; times are integer milliseconds"""
+    __slots__ = ('start_ms', 'end_ms', 'text')
+
+    def __init__(self, start_ms, end_ms, text):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+
+def to_ms(hours, minutes, seconds, fraction, scale=1):
+    """Clock fields (strings, hours may be None) to milliseconds; scale converts fraction units"""
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction) * scale
+
+def timing_segment(match, text):
+    """Segment from an SRT/WebVTT timing match (eight clock groups)"""
+    g = match.groups()
+    return Segment(to_ms(*g[0:4]), to_ms(*g[4:8]), text)
+
+def iter_srt_segments(lines, markdown=False):
+    """SRT cues are blocks separated by blank lines
+
+    Lines before the timing line are cue numbers and are dropped. Markdown
+    transcripts skip '##' headings and keep such lines as text, as the
+    original Markdown parser did.
+    """
+    timing = None
+    text_lines = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if timing and text_lines:
+                text = ' '.join(text_lines) if markdown else MARKUP.sub('', ' '.join(text_lines)).strip()
+                if text:
+                    yield timing_segment(timing, text)
+            timing = None
+            text_lines = []
+        elif markdown and line.startswith('##'):
+            continue
+        elif '-->' in line:
+            # An unparseable timing line drops the cue (False), a later valid one replaces it
+            timing = SRT_TIMING.match(line) or False
+            if not markdown:
+                text_lines = []
+        else:
+            text_lines.append(line)
+
+    if timing and text_lines:
+        text = ' '.join(text_lines) if markdown else MARKUP.sub('', ' '.join(text_lines)).strip()
+        if text:
+            yield timing_segment(timing, text)
+
+def iter_vtt_segments(lines):
+    """WebVTT cues: optional identifier, timing line with settings, payload with markup
+
+    The WEBVTT header and NOTE/STYLE/REGION blocks are skipped.
+    """
+    timing = None
+    text_lines = []
+    skip_block = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if timing and text_lines:
+                text = MARKUP.sub('', ' '.join(text_lines)).strip()
+                if text:
+                    yield timing_segment(timing, text)
+            timing = None
+            text_lines = []
+            skip_block = False
+        elif skip_block:
+            continue
+        elif timing is None:
+            if '-->' in line:
+                timing = VTT_TIMING.match(line) or False
+            elif line.startswith(VTT_SKIPPED_BLOCKS):
+                skip_block = True
+        elif timing:
+            text_lines.append(line)
+
+    if timing and text_lines:
+        text = MARKUP.sub('', ' '.join(text_lines)).strip()
+        if text:
+            yield timing_segment(timing, text)
+
+def iter_ass_segments(lines):
+    """ASS/SSA Dialogue events; times are H:MM:SS.cc, override tags and \\N are removed"""
+    for line in lines:
+        if not line.startswith('Dialogue:'):
+            continue
+        match = ASS_DIALOGUE.match(line)
+        if not match:
+            continue
+        g = match.groups()
+        text = ' '.join(ASS_OVERRIDES.sub(' ', g[8]).split())
+        if text:
+            yield Segment(to_ms(*g[0:4], scale=10), to_ms(*g[4:8], scale=10), text)
+
+def detect_format(file_path, head=None):
+    """Format name from the extension, or from the first bytes for unknown extensions"""
+    suffix = Path(file_path).suffix.lower()
+    if suffix in ('.srt', '.vtt', '.md'):
+        return suffix[1:]
+    if suffix in ('.ass', '.ssa'):
+        return 'ass'
+
+    if head is None:
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            head = f.read(1024)
+    stripped = head.lstrip()
+    if stripped.startswith('WEBVTT'):
+        return 'vtt'
+    if stripped.startswith('[Script Info]') or 'Dialogue:' in head:
+        return 'ass'
+    if '-->' in head:
+        return 'srt'
+    return None
+
+def iter_file_segments(file_path, fmt=None):
+    """Yield Segments from a subtitle file, detecting its format if not given"""
+    fmt = fmt or detect_format(file_path)
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        if fmt == 'vtt':
+            yield from iter_vtt_segments(f)
+        elif fmt == 'ass':
+            yield from iter_ass_segments(f)
+        elif fmt in ('srt', 'md'):
+            yield from iter_srt_segments(f, markdown=fmt == 'md')
+        else:
+            raise ValueError(f"Unknown subtitle format: {file_path}")